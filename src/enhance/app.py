@@ -1,48 +1,80 @@
-from glob import glob
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import contextlib
+from importlib.util import find_spec
+import itertools
 import json
-import time
 import logging
-from enum import Enum
-from typing import List
 import os
 import sys
-import shutil
+import threading
 import time
-import os
-
-from huggingface_hub import HfApi
-
+from typing import Dict, List
 
+from enhance.lib import cache
 from enhance.lib.util import Observable
-from enhance.lib.file import AppliedOperation, File, InputFile, OutputFile, Operation
+from enhance.lib.file import AppliedOperation, File, InputFile, OutputFile, Operation, copy_file
 from enhance.lib.gpu import GPUInfo
 
 logger = logging.getLogger(__name__)
 
+# Expandable segments reduce allocator fragmentation from repeated tile-sized allocations. The caching allocator
+# reads this when CUDA is first initialized (in App.__init__ at the earliest), not when torch is imported, so it
+# can follow the imports above.
+os.environ.setdefault("PYTORCH_CUDA_ALLOC_CONF", "expandable_segments:True")
+
 # Use deferred loading for torch and modules that use torch to reduce startup latency.
 from deferred_import import deferred_import
 
 torch = deferred_import("torch")
 modelRunner = deferred_import("enhance.op.model_runner")
 
-# Conditionally import mask generation and subject detection modules
-DO_DETECT = False
+# orjson is optional; it parses the model catalog considerably faster than the stdlib.
 try:
-    import enhance.op.masks as generate_masks
-
-    DO_DETECT = True
-except ImportError as e:
-    logger.warning(f"Optional detection modules not available: {e}")
-    pass
+    import orjson
+except ImportError:
+    orjson = None
+
+# Mask generation and subject detection depend on optional modules. Probe for them without importing,
+# and defer loading the detection pipeline until it is first used.
+DO_DETECT = all(find_spec(name) is not None for name in ("transformers", "sam2"))
+if DO_DETECT:
+    generate_masks = deferred_import("enhance.op.masks")
+else:
+    logger.warning("Optional detection modules not available: transformers and sam2 are required")
+
+# Use the multi-connection Rust downloader for model files when it is installed. huggingface_hub reads this
+# at import time, which is deferred until the first download.
+if find_spec("hf_transfer") is not None:
+    os.environ.setdefault("HF_HUB_ENABLE_HF_TRANSFER", "1")
 
 HF_REPO_ID = "gkyle/enhance"
 MODEL_CONFIG = "models.json"
+# Number of ModelRunners kept alive for reuse across runs
+RUNNER_CACHE_SIZE = 4
+# Concurrent downloads when installing several models at once
+FETCH_WORKERS = 4
+# Set ENHANCE_FP32=1 to run models at full precision if reduced precision causes artifacts
+FORCE_FP32 = os.environ.get("ENHANCE_FP32", "0") == "1"
 
 class App:
 
     def __init__(self):
+        # Resolve working paths once; the cache directory is created up front so callers needn't check for it.
+        self._cwd = os.getcwd()
+        self._cachePath = os.path.join(self._cwd, ".cache") + os.sep
+        self._modelRoot = os.path.join(self._cwd, "models") + os.sep
+        os.makedirs(self._cachePath, exist_ok=True)
+        # Cache copies are named by session start time plus a counter, so copies made within the same
+        # second don't overwrite each other.
+        self._sessionTag = time.strftime("%Y%m%d-%H%M%S")
+        self._cacheSeq = itertools.count()
+
         self.baseFile: InputFile = None
-        self.rawFiles: List[File] = []
+        # Files keyed by id() for O(1) removal; dict order preserves insertion order
+        self.rawFiles: Dict[int, File] = {}
+        # OutputFiles in rawFiles whose saved flag is False, kept current through File.savedListener
+        self._unsavedCount = 0
         self.doDetect = DO_DETECT
         if len(sys.argv) > 1:
             if os.path.exists(sys.argv[1]):
@@ -58,18 +90,86 @@ class App:
 
         self.gpuInfo = GPUInfo()
         self.activeOperation: Observable = None
+        # Created on first download so sessions that only run local models skip the huggingface_hub import.
+        self._hfApi = None
+        self._autocastDtypeCache = None
+        # ModelRunners keyed by (modelKey, tileSize, tilePadding, maintainScale, device), least recently used first
+        self._runnerCache: OrderedDict = OrderedDict()
+        # Serializes read-modify-write updates of the model catalog
+        self._modelsLock = threading.Lock()
+        # Parsed models.json and its installed-only view, valid while the file's (mtime, size) is unchanged
+        self._modelsCache: dict = None
+        self._installedModelsCache: dict = None
+        # primary operation -> {path: model}, built on demand from the caches above
+        self._modelsByOperation: dict = None
+        self._installedModelsByOperation: dict = None
+        self._modelsSignature = None
 
         # environment settings
-        # use bfloat16
-        torch.autocast(device_type="cuda", dtype=torch.bfloat16).__enter__()
-
+        # Only touch CUDA when it is present, so MPS/CPU-only hosts never create a CUDA context at startup.
+        if self.gpuInfo.cudaAvailable:
+            try:
+                if torch.cuda.get_device_properties(0).major >= 8:
+                    # turn on tfloat32 for Ampere GPUs
+                    # (https://pytorch.org/docs/stable/notes/cuda.html#tensorfloat-32-tf32-on-ampere-devices)
+                    torch.backends.cuda.matmul.allow_tf32 = True
+                    torch.backends.cudnn.allow_tf32 = True
+            except:
+                pass
+
+        # Import the model runner stack (spandrel and its architectures) in the background so the first
+        # model run doesn't pay for it on the UI's click path. Python's import lock makes a concurrent
+        # first use wait for this import to finish rather than import twice.
+        threading.Thread(target=self._warmImports, daemon=True).start()
+
+    def _warmImports(self):
         try:
-            if torch.cuda.get_device_properties(0).major >= 8:
-                # turn on tfloat32 for Ampere GPUs (https://pytorch.org/docs/stable/notes/cuda.html#tensorfloat-32-tf32-on-ampere-devices)
-                torch.backends.cuda.matmul.allow_tf32 = True
-                torch.backends.cudnn.allow_tf32 = True
-        except:
-            pass
+            import enhance.op.model_runner  # noqa: F401
+        except Exception as e:
+            logger.warning(f"Background import of model runner failed: {e}")
+
+    def _inferenceContext(self, device: str):
+        """Scope reduced-precision autocast and inference mode to model execution only."""
+        stack = contextlib.ExitStack()
+        if not FORCE_FP32 and device is not None and device.startswith("cuda"):
+            stack.enter_context(torch.autocast(device_type="cuda", dtype=self._autocastDtype()))
+        stack.enter_context(torch.inference_mode())
+        return stack
+
+    def _autocastDtype(self):
+        # bfloat16 keeps fp32's range; GPUs without it (pre-Ampere) get float16 tensor cores instead
+        if self._autocastDtypeCache is None:
+            self._autocastDtypeCache = torch.bfloat16 if torch.cuda.is_bf16_supported() else torch.float16
+        return self._autocastDtypeCache
+
+    def _getRunner(
+        self,
+        modelKey: str,
+        tileSize: int,
+        tilePadding: int,
+        maintainScale: bool,
+        device: str,
+    ):
+        """Return a cached ModelRunner for these settings, creating one if needed."""
+        key = (modelKey, tileSize, tilePadding, maintainScale, device)
+        runner = self._runnerCache.get(key)
+        if runner is not None:
+            self._runnerCache.move_to_end(key)
+            return runner
+
+        runner = modelRunner.ModelRunner(
+            modelKey,
+            tileSize,
+            tilePadding,
+            maintainScale,
+            device,
+            modelRoot=self.getModelRoot(),
+        )
+        self._runnerCache[key] = runner
+        if len(self._runnerCache) > RUNNER_CACHE_SIZE:
+            # Runners hold no weights (the network lives in model_runner's load cache), so eviction frees no memory
+            self._runnerCache.popitem(last=False)
+        return runner
 
     def setBaseFile(self, path: str) -> InputFile:
         self.baseFile = InputFile(path)
@@ -79,37 +179,51 @@ class App:
         return self.baseFile
 
     def getFileList(self) -> List[File]:
-        return self.rawFiles
+        return list(self.rawFiles.values())
 
     def clearFileList(self) -> None:
-        self.rawFiles = []
+        for file in self.rawFiles.values():
+            file.savedListener = None
+        self.rawFiles = {}
+        self._unsavedCount = 0
+
+    def addFile(self, file: File) -> File:
+        if id(file) not in self.rawFiles:
+            self.rawFiles[id(file)] = file
+            if isinstance(file, OutputFile):
+                file.savedListener = self._onSavedChanged
+                if not file.saved:
+                    self._unsavedCount += 1
+        return file
 
     def appendFile(
         self, path: str, baseFile: InputFile = None
     ) -> File:
         file = OutputFile(path, baseFile)
-        self.rawFiles.append(file)
-        return file
+        return self.addFile(file)
 
     def removeFile(self, file: File) -> None:
-        self.rawFiles.remove(file)
+        file = self.rawFiles.pop(id(file), None)
+        if isinstance(file, OutputFile):
+            file.savedListener = None
+            if not file.saved:
+                self._unsavedCount -= 1
+
+    def _onSavedChanged(self, file: File, saved: bool) -> None:
+        self._unsavedCount += -1 if saved else 1
 
     def createOutputFile(self, baseFile: InputFile) -> OutputFile:
         """Create a new OutputFile from a base file, copying its image to cache"""
 
-        # Create cache directory if needed
-        cachePath = os.getcwd() + "/.cache/"
-        if not os.path.exists(cachePath):
-            os.makedirs(cachePath)
+        cachePath = self._cachePath
 
         # Generate output path
-        baseName = os.path.basename(baseFile.path)
-        base, ext = os.path.splitext(baseName)
-        timestamp = time.strftime("%Y%m%d-%H%M%S")
-        outPath = os.path.join(cachePath, f"{base}_copy_{timestamp}{ext}")
+        base, ext = baseFile.baseNoExt, baseFile.ext
+        outPath = os.path.join(cachePath, f"{base}_copy_{self._sessionTag}_{next(self._cacheSeq)}{ext}")
 
         # Copy the base file to cache
-        shutil.copyfile(baseFile.path, outPath)
+        copy_file(baseFile.path, outPath)
+        cache.recordCacheFile(outPath)
 
         # Create OutputFile
         outputFile = OutputFile(outPath, baseFile)
@@ -127,21 +241,18 @@ class App:
         operation: Operation = Operation.Sharpen,
         masks: list = None,
     ) -> OutputFile:
-        runner = modelRunner.ModelRunner(
-            modelKey,
-            tileSize,
-            tilePadding,
-            maintainScale,
-            device,
-            modelRoot=self.getModelRoot(),
-        )
+        runner = self._getRunner(modelKey, tileSize, tilePadding, maintainScale, device)
         runner.addObserver(progressBar)
         self.activeOperation = runner
-        outputFile = runner.run(file, operation, masks=masks)
-        runner.removeObserver(progressBar)
+        try:
+            with self._inferenceContext(device):
+                outputFile = runner.run(file, operation, masks=masks)
+        finally:
+            # Runners are reused, so never leave a stale observer attached
+            runner.removeObserver(progressBar)
         if outputFile is None:
             return None
-        self.rawFiles.append(outputFile)
+        self.addFile(outputFile)
         return outputFile
 
     def runModelOnExisting(
@@ -157,27 +268,37 @@ class App:
         masks: list = None,
     ) -> OutputFile:
         """Run a model on an existing OutputFile, appending the operation"""
-        runner = modelRunner.ModelRunner(
-            modelKey,
-            tileSize,
-            tilePadding,
-            maintainScale,
-            device,
-            modelRoot=self.getModelRoot(),
-        )
+        runner = self._getRunner(modelKey, tileSize, tilePadding, maintainScale, device)
         runner.addObserver(progressBar)
         self.activeOperation = runner
-        result = runner.runOnExisting(outputFile, operation, masks=masks)
-        runner.removeObserver(progressBar)
+        try:
+            with self._inferenceContext(device):
+                result = runner.runOnExisting(outputFile, operation, masks=masks)
+        finally:
+            runner.removeObserver(progressBar)
         return result
 
-    def runAutoMask(self, file: InputFile, progressBar):
-        if self.doDetect:
-            device = self.gpuInfo.getPreferredDevice()
-            generateMasksOp = generate_masks.GenerateMasks(device)
-            generateMasksOp.addObserver(progressBar)
-            self.activeOperation = generateMasksOp
-            success = generateMasksOp.run(file)
+    def runAutoMask(self, file: InputFile, progressBar) -> bool:
+        """Generate masks for file. Returns whether any masks were found."""
+        global DO_DETECT
+        if not self.doDetect:
+            return False
+        try:
+            GenerateMasks = generate_masks.GenerateMasks
+        except ImportError as e:
+            # find_spec only shows the modules are present; the deferred import is where they actually load
+            logger.warning(f"Optional detection modules not available: {e}")
+            DO_DETECT = False
+            self.doDetect = False
+            return False
+        device = self.gpuInfo.getPreferredDevice()
+        generateMasksOp = GenerateMasks(device)
+        generateMasksOp.addObserver(progressBar)
+        self.activeOperation = generateMasksOp
+        try:
+            with self._inferenceContext(device):
+                return generateMasksOp.run(file)
+        finally:
             generateMasksOp.removeObserver(progressBar)
 
     def interruptOperation(self):
@@ -191,7 +312,7 @@ class App:
     ) -> list:
         """Prepare to re-run operations from startIndex onward."""
         # Collect the operations that need to be re-run (from startIndex onwards)
-        opsToRerun = list(compareFile.operations[startIndex:])
+        opsToRerun = compareFile.operations[startIndex:]
 
         # Remove these operations from the file
         compareFile.removeOperationsFrom(startIndex)
@@ -199,14 +320,11 @@ class App:
         # Reset the file path to the state before these operations
         if startIndex == 0:
             # Copy base file to cache and set as current path
-            rootPath = os.path.normpath(os.path.join(os.getcwd(), ".cache"))
-            if not os.path.exists(rootPath):
-                os.makedirs(rootPath)
-            baseName = os.path.basename(compareFile.baseFile.path)
-            base, ext = os.path.splitext(baseName)
-            timestamp = time.strftime("%Y%m%d-%H%M%S")
-            newPath = os.path.join(rootPath, f"{base}_reset_{timestamp}{ext}")
-            shutil.copyfile(compareFile.baseFile.path, newPath)
+            rootPath = self._cachePath
+            base, ext = compareFile.baseFile.baseNoExt, compareFile.baseFile.ext
+            newPath = os.path.join(rootPath, f"{base}_reset_{self._sessionTag}_{next(self._cacheSeq)}{ext}")
+            copy_file(compareFile.baseFile.path, newPath)
+            cache.recordCacheFile(newPath)
             compareFile.setPath(newPath)
         else:
             # Use reapplyStrength to regenerate from previous operations
@@ -227,26 +345,21 @@ class App:
         device = self.gpuInfo.getPreferredDevice()
         maintainScale = op.scale is not None and op.scale < 1.0
 
-        runner = modelRunner.ModelRunner(
-            op.modelPath,
-            tileSize,
-            tilePadding,
-            maintainScale,
-            device,
-            modelRoot=self.getModelRoot(),
-        )
+        runner = self._getRunner(op.modelPath, tileSize, tilePadding, maintainScale, device)
         if progressCallback:
             runner.addObserver(progressCallback)
         self.activeOperation = runner
 
-        result = runner.runOnExisting(
-            compareFile,
-            op.operation_type,
-            masks=op.masks if op.masks else None,
-        )
-
-        if progressCallback:
-            runner.removeObserver(progressCallback)
+        try:
+            with self._inferenceContext(device):
+                result = runner.runOnExisting(
+                    compareFile,
+                    op.operation_type,
+                    masks=op.masks if op.masks else None,
+                )
+        finally:
+            if progressCallback:
+                runner.removeObserver(progressCallback)
 
         if result is None:
             logger.error(f"Failed to re-run operation: {op.operation_type}")
@@ -260,73 +373,139 @@ class App:
 
         return True
 
+    def releaseCachedMemory(self):
+        """Return cached CUDA allocator blocks to the driver. Call at operation boundaries, never per tile."""
+        if self.gpuInfo.cudaAvailable:
+            torch.cuda.empty_cache()
+
     def getModelRoot(self) -> str:
-        return os.path.join("models/")
+        return self._modelRoot
+
+    def _loadModels(self, modelListPath):
+        if orjson is not None:
+            with open(modelListPath, "rb") as f:
+                return orjson.loads(f.read())
+        with open(modelListPath, "r") as f:
+            return json.load(f)
 
     def getModels(self, installed=False):
+        """Return the model catalog, re-reading models.json only when it changes on disk.
+
+        The returned dict is shared with the cache; modify it only to pass it back to storeModels.
+        """
         modelListPath = self.getModelRoot() + MODEL_CONFIG
         try:
-            with open(modelListPath, "r") as f:
-                models = json.load(f)
-            if installed:
-                models = {
+            st = os.stat(modelListPath)
+            signature = (st.st_mtime_ns, st.st_size)
+            if self._modelsCache is None or signature != self._modelsSignature:
+                models = self._loadModels(modelListPath)
+                self._modelsCache = models
+                self._installedModelsCache = {
                     path: model
                     for path, model in models.items()
                     if model.get("installed")
                 }
-            return models
+                self._modelsByOperation = None
+                self._installedModelsByOperation = None
+                self._modelsSignature = signature
+            return self._installedModelsCache if installed else self._modelsCache
         except Exception as e:
             return {}
 
+    def _indexByOperation(self, models: dict) -> dict:
+        index = {}
+        for path, model in models.items():
+            operations = model.get("operation")
+            if operations:
+                index.setdefault(operations[0], {})[path] = model
+        return index
+
+    def getModelsByOperation(self, operation: str, installed=False) -> dict:
+        """Return the catalog entries whose primary operation is operation, in catalog order.
+
+        The index is rebuilt only when getModels reloads the catalog; the returned dict is shared with it.
+        """
+        models = self.getModels(installed=installed)
+        if installed:
+            if self._installedModelsByOperation is None:
+                self._installedModelsByOperation = self._indexByOperation(models)
+            index = self._installedModelsByOperation
+        else:
+            if self._modelsByOperation is None:
+                self._modelsByOperation = self._indexByOperation(models)
+            index = self._modelsByOperation
+        return index.get(operation, {})
+
     def storeModels(self, models):
         modelListPath = self.getModelRoot() + MODEL_CONFIG
+        self._modelsCache = None
+        self._modelsByOperation = None
+        self._installedModelsByOperation = None
+        # Always the stdlib: orjson can only indent by 2 and writes non-ASCII as is, which would change the file
         with open(modelListPath, "w") as f:
             json.dump(models, f, indent=4)
 
+    def _getHfApi(self):
+        if self._hfApi is None:
+            from huggingface_hub import HfApi
+
+            self._hfApi = HfApi()
+        return self._hfApi
+
     def fetchFile(self, path):
         modelInstallPath = self.getModelRoot()
-        hf_api_client = HfApi()
-        hf_api_client.list_repo_files(HF_REPO_ID)
-        hf_api_client.hf_hub_download(
+        self._getHfApi().hf_hub_download(
             repo_id=HF_REPO_ID, filename=path, local_dir=modelInstallPath
         )
 
     def fetchModel(self, path):
-        self.fetchFile(path)
+        self.fetchModels([path])
+
+    def fetchModels(self, paths: List[str], maxWorkers: int = FETCH_WORKERS):
+        """Download several models concurrently, then mark them installed in a single catalog update."""
+        fetched = []
+        error = None
+        with ThreadPoolExecutor(max_workers=max(1, min(maxWorkers, len(paths)))) as pool:
+            futures = {pool.submit(self.fetchFile, path): path for path in paths}
+            for future, path in futures.items():
+                try:
+                    future.result()
+                    fetched.append(path)
+                except Exception as e:
+                    logger.error(f"Error fetching model {path}: {e}")
+                    error = error or e
 
         # Save the updated local models list
-        models = self.getModels()
-        if path in models:
-            models[path]["installed"] = True
-            self.storeModels(models)
+        with self._modelsLock:
+            models = self.getModels()
+            updated = False
+            for path in fetched:
+                if path in models:
+                    models[path]["installed"] = True
+                    updated = True
+            if updated:
+                self.storeModels(models)
+
+        if error is not None:
+            raise error
 
     def refreshModelList(self):
-        existingModels = self.getModels()
-        self.fetchFile(MODEL_CONFIG)
-        refreshedModels = self.getModels()
-        for modelName, modelData in refreshedModels.items():
-            if modelName not in existingModels:
-                modelData["installed"] = False
-            else:
-                modelData["installed"] = existingModels[modelName].get(
-                    "installed", False
-                )
-        self.storeModels(refreshedModels)
+        with self._modelsLock:
+            existingModels = self.getModels()
+            self.fetchFile(MODEL_CONFIG)
+            refreshedModels = self.getModels()
+            for modelName, modelData in refreshedModels.items():
+                if modelName not in existingModels:
+                    modelData["installed"] = False
+                else:
+                    modelData["installed"] = existingModels[modelName].get(
+                        "installed", False
+                    )
+            self.storeModels(refreshedModels)
 
     def hasUnsavedChanges(self):
-        for file in self.rawFiles:
-            if isinstance(file, OutputFile) and not file.saved:
-                return True
-        return False
+        return self._unsavedCount > 0
 
     # Clear cache files older than 7 days
     def clearCacheExpiredFiles(self):
-        rootPath = os.getcwd() + "/.cache/"
-        files = glob(rootPath + "*")
-        for file in files:
-            file_mod_time = os.path.getmtime(file)
-            if file_mod_time < (time.time() - 60 * 60 * 24 * 7):
-                try:
-                    os.remove(file)
-                except Exception as e:
-                    logger.warning(f"Error removing file {file}: {e}")
+        cache.clearExpiredFiles(self._cachePath, 60 * 60 * 24 * 7)
@@ -0,0 +1,95 @@
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Append-only log of files written to the cache directory, one "<created>\t<path>" line per file.
+# Lets the expiry sweep find old files without stat-ing every entry in a large cache.
+CACHE_INDEX = "_index.log"
+
+_indexLock = threading.Lock()
+
+
+def recordCacheFile(path: str) -> None:
+    """Record a newly written cache file in its directory's index."""
+    indexPath = os.path.join(os.path.dirname(path), CACHE_INDEX)
+    line = f"{time.time():.0f}\t{path}\n"
+    try:
+        with _indexLock, open(indexPath, "a", encoding="utf-8") as f:
+            f.write(line)
+    except OSError as e:
+        logger.warning(f"Error updating cache index {indexPath}: {e}")
+
+
+def clearExpiredFiles(rootPath: str, maxAge: float) -> None:
+    """Remove cache files older than maxAge seconds.
+
+    Uses the index when present, so the cost is proportional to the number of indexed files rather than a
+    stat per directory entry. Without an index (first run, or a cache from an older version) the directory
+    is scanned once and an index of the surviving files is written.
+    """
+    cutoff = time.time() - maxAge
+    indexPath = os.path.join(rootPath, CACHE_INDEX)
+    with _indexLock:
+        if os.path.exists(indexPath):
+            entries = _readIndex(indexPath)
+        else:
+            entries = _scanDirectory(rootPath)
+            if entries is None:
+                return
+
+        survivors = []
+        for created, path in entries:
+            if created >= cutoff:
+                survivors.append((created, path))
+                continue
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            except Exception as e:
+                logger.warning(f"Error removing file {path}: {e}")
+                survivors.append((created, path))
+
+        _writeIndex(indexPath, survivors)
+
+
+def _readIndex(indexPath: str) -> list:
+    entries = []
+    with open(indexPath, "r", encoding="utf-8") as f:
+        for line in f:
+            created, _, path = line.rstrip("\n").partition("\t")
+            try:
+                entries.append((float(created), path))
+            except ValueError:
+                continue
+    return entries
+
+
+def _scanDirectory(rootPath: str) -> list:
+    entries = []
+    try:
+        it = os.scandir(rootPath)
+    except FileNotFoundError:
+        return None
+    with it:
+        for entry in it:
+            if entry.name == CACHE_INDEX:
+                continue
+            try:
+                entries.append((entry.stat().st_mtime, entry.path))
+            except FileNotFoundError:
+                pass
+    return entries
+
+
+def _writeIndex(indexPath: str, entries: list) -> None:
+    tmpPath = indexPath + ".tmp"
+    try:
+        with open(tmpPath, "w", encoding="utf-8") as f:
+            f.writelines(f"{created:.0f}\t{path}\n" for created, path in entries)
+        os.replace(tmpPath, indexPath)
+    except OSError as e:
+        logger.warning(f"Error writing cache index {indexPath}: {e}")
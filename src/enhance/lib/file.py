@@ -1,7 +1,10 @@
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
 from enum import Enum
 import hashlib
 import os
 import shutil
+import threading
 import time
 from typing import List
 
@@ -9,6 +12,7 @@ import cv2
 import numpy as np
 import logging
 
+from enhance.lib.cache import recordCacheFile
 from enhance.ui.common import writeTiffFile, writeFile
 
 logger = logging.getLogger(__name__)
@@ -18,6 +22,59 @@ logger = logging.getLogger(__name__)
 # that libraries like tifftools append during writes.
 _MAX_FILENAME_PATH = 240
 
+# Strengths this close to 0 or 1 skip blending and return the input or model output as is
+_STRENGTH_EPSILON = 1e-6
+
+# Upper bound on decoded pixels kept by read_image (bytes)
+_IMAGE_CACHE_BYTES = 1024 * 1024 * 1024
+
+
+class _ImageCache:
+    """LRU cache of decoded images keyed by (path, mtime, size), bounded by total array bytes."""
+
+    def __init__(self, maxBytes: int):
+        self.maxBytes = maxBytes
+        self.entries: OrderedDict = OrderedDict()
+        self.totalBytes = 0
+        self.lock = threading.Lock()
+
+    def read(self, path: str):
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        key = (path, st.st_mtime_ns, st.st_size)
+        with self.lock:
+            img = self.entries.get(key)
+            if img is not None:
+                self.entries.move_to_end(key)
+                return img
+
+        img = cv2.imread(path, cv2.IMREAD_UNCHANGED)
+        if img is None or img.nbytes > self.maxBytes:
+            return img
+
+        with self.lock:
+            if key not in self.entries:
+                self.entries[key] = img
+                self.totalBytes += img.nbytes
+            while self.totalBytes > self.maxBytes:
+                _, evicted = self.entries.popitem(last=False)
+                self.totalBytes -= evicted.nbytes
+        return img
+
+
+_imageCache = _ImageCache(_IMAGE_CACHE_BYTES)
+
+
+def read_image(path: str):
+    """Decode an image with cv2.IMREAD_UNCHANGED, reusing a recent decode of the same file.
+
+    The returned array may be shared with other callers and must not be modified in place.
+    """
+    wait_for_write(path)
+    return _imageCache.read(path)
+
 
 class Unpickle:
     # forces reinitialization of instance during unpickling so that fields that weren't present at pickling time are present at run time.
@@ -33,17 +90,47 @@ class File(Unpickle):
 
     def __init__(self, path):
         super().__init__()
-        self.basename = os.path.basename(path) if path else None
-        self.path = path
+        self._updatePath(path)
         self.timestamp = 0
+        # Called with (file, saved) whenever saved flips; App sets it on the files it tracks
+        self.savedListener = None
         self.saved = False
 
+    def __getstate__(self):
+        state = super().__getstate__()
+        state.pop("savedListener", None)
+        return state
+
+    def __setstate__(self, state: dict):
+        # saved is a property now; older pickles stored it as a plain attribute
+        if "saved" in state:
+            state["_saved"] = state.pop("saved")
+        super().__setstate__(state)
+
+    @property
+    def saved(self) -> bool:
+        return self._saved
+
+    @saved.setter
+    def saved(self, saved: bool):
+        changed = saved != self.__dict__.get("_saved")
+        self._saved = saved
+        if changed and self.savedListener is not None:
+            self.savedListener(self, saved)
+
     def setPath(self, path):
+        self._updatePath(path)
+
+    def _updatePath(self, path):
+        # Accept pathlib.Path and other path-like objects, but store plain strings
+        path = os.fspath(path) if path is not None else None
         self.path = path
         self.basename = os.path.basename(path) if path else None
+        # Split once here so the save paths don't have to on every write
+        self.baseNoExt, self.ext = os.path.splitext(self.basename) if self.basename else (None, None)
 
     def loadUnchanged(self):
-        return cv2.imread(self.path, cv2.IMREAD_UNCHANGED)
+        return read_image(self.path)
 
 
 class Mask:
@@ -73,15 +160,34 @@ class Label:
 
 
 class InputFile(File):
-    def __init__(self, path):
+    def __init__(self, path=None):
         super().__init__(path)
         self.masks: list[Mask] = []
         self.labels: list[Label] = []
+        # Masks grouped by base label, so addMask doesn't rescan every mask
+        self._masksByLabel: dict[str, list[Mask]] = {}
+
+    def __setstate__(self, state: dict):
+        super().__setstate__(state)
+        self._indexMasks()
+
+    def _indexMasks(self):
+        self._masksByLabel = {}
+        for m in self.masks:
+            self._masksByLabel.setdefault(m.label, []).append(m)
+
+    def clearMasks(self):
+        self.masks = []
+        self._masksByLabel = {}
 
     def addMask(self, mask: Mask):
         """Add a mask with a unique label"""
+        # Re-index if the mask list was replaced or extended without going through addMask/clearMasks
+        if sum(len(group) for group in self._masksByLabel.values()) != len(self.masks):
+            self._indexMasks()
+
         # Find existing masks with the same base label
-        existing = [m for m in self.masks if m.label == mask.label]
+        existing = self._masksByLabel.setdefault(mask.label, [])
         count = len(existing)
 
         if count == 0:
@@ -95,6 +201,7 @@ class InputFile(File):
             # Third or later - just number the new one
             mask.uniqueLabel = f"{mask.label}_{count + 1}"
 
+        existing.append(mask)
         self.masks.append(mask)
 
 
@@ -137,32 +244,48 @@ class AppliedOperation:
                 self.strength = strength
         else:
             self.strength = strength
-        # Path to the raw (unblended, unscaled) model output
+        # Path to the raw (unblended, unscaled) model output, saved as .npy
         self.rawOutputPath: str = None
+        # In-memory copy of the raw output while its .npy is being written; dropped once the write lands
+        self.rawOutputArray: np.ndarray = None
         # List of masks to apply to this operation (only process within masked regions)
         self.masks: List["Mask"] = masks if masks is not None else []
 
+    # Fields that feed into getPathExtra; assigning any of them drops the cached value. Masks must be
+    # replaced with a new list rather than modified in place.
+    _PATH_FIELDS = frozenset(("operation_type", "model", "strength", "scale", "masks"))
+
+    def __setattr__(self, name, value):
+        if name in self._PATH_FIELDS:
+            self.__dict__["_pathExtra"] = None
+        super().__setattr__(name, value)
+
     def getPathExtra(self) -> str:
+        if self._pathExtra is None:
+            self._pathExtra = self._buildPathExtra()
+        return self._pathExtra
+
+    def _buildPathExtra(self) -> str:
         if self.operation_type and self.model:
-            base = f"_{self.operation_type.value}_{self.model}"
+            parts = [f"_{self.operation_type.value}_{self.model}"]
             # Include strength in path if not 100%
             if self.strength is not None and self.strength < 1.0:
-                base += f"_s{int(self.strength * 100)}"
+                parts.append(f"_s{int(self.strength * 100)}")
             # Include scale in path if downscaling
             if self.scale is not None and self.scale < 1.0:
-                base += f"_d{int(1/self.scale)}X"
+                parts.append(f"_d{int(1/self.scale)}X")
             # Include mask labels if any
             if self.masks:
                 # Separate inside and outside masks for path naming
-                inside_masks = [m for m in self.masks if not m.inverted]
-                outside_masks = [m for m in self.masks if m.inverted]
-                if inside_masks:
-                    inside_labels = "_".join(m.uniqueLabel.replace(" ", "-") for m in inside_masks)
-                    base += f"_m{inside_labels}"
-                if outside_masks:
-                    outside_labels = "_".join(m.uniqueLabel.replace(" ", "-") for m in outside_masks)
-                    base += f"_minv{outside_labels}"
-            return base
+                inside_labels = [m.uniqueLabel.replace(" ", "-") for m in self.masks if not m.inverted]
+                outside_labels = [m.uniqueLabel.replace(" ", "-") for m in self.masks if m.inverted]
+                if inside_labels:
+                    parts.append("_m")
+                    parts.append("_".join(inside_labels))
+                if outside_labels:
+                    parts.append("_minv")
+                    parts.append("_".join(outside_labels))
+            return "".join(parts)
         return ""
 
     def supportsStrength(self) -> bool:
@@ -183,10 +306,12 @@ class OutputFile(File):
         super().__init__(path)
 
         self.baseFile = baseFile
-        self.origPath = path
+        self.origPath = self.path
 
         # List of model operations applied to this file
         self.operations: List[AppliedOperation] = []
+        # id(operation) -> position in operations, rebuilt on demand after operations change
+        self._opIndex: dict = None
 
     def getFirstOperation(self) -> AppliedOperation:
         """Get the first operation, or None if none exist"""
@@ -194,15 +319,19 @@ class OutputFile(File):
 
     def getOperationIndex(self, operation: AppliedOperation) -> int:
         """Get the index of an operation, or -1 if not found"""
-        for i, op in enumerate(self.operations):
-            if op is operation:
-                return i
-        return -1
+        if self._opIndex is None:
+            self._opIndex = {id(op): i for i, op in enumerate(self.operations)}
+        i = self._opIndex.get(id(operation), -1)
+        # Guard against a stale entry whose id was reused by a different object
+        if i < 0 or i >= len(self.operations) or self.operations[i] is not operation:
+            return -1
+        return i
 
     def removeOperationsFrom(self, index: int):
         """Remove all operations from the given index onwards"""
         if index >= 0 and index < len(self.operations):
-            self.operations = self.operations[:index]
+            del self.operations[index:]
+            self._opIndex = None
 
     def addOperation(
         self,
@@ -224,6 +353,7 @@ class OutputFile(File):
                 masks=masks,
             )
         )
+        self._opIndex = None
 
         return self.operations[-1]
 
@@ -240,26 +370,28 @@ class OutputFile(File):
         rootPath = os.path.normpath(os.path.join(os.getcwd(), ".cache"))
         if not os.path.exists(rootPath):
             os.makedirs(rootPath)
-        baseName = os.path.basename(self.baseFile.path)
-        base, ext = os.path.splitext(baseName)
+        base = self.baseFile.baseNoExt
         timestamp = time.strftime("%Y%m%d-%H%M%S")
 
-        # Save raw output with _raw suffix
-        rawFilename = f"{base}_{operation.operation_type.value}_{operation.model}_raw_{timestamp}{ext}"
+        # Save raw output with _raw suffix. It's never shown to the user, so store it as .npy: lossless at full
+        # precision and written at memcpy speed, with no image codec involved.
+        rawFilename = f"{base}_{operation.operation_type.value}_{operation.model}_raw_{timestamp}.npy"
         rawFilename = _truncate_path(rootPath, rawFilename)
         rawPath = os.path.join(rootPath, rawFilename)
 
         logger.info(f"Saving raw model output to: {rawPath}")
-        if ext.lower() in [".tif", ".tiff"]:
-            writeTiffFile(img, self.baseFile.path, rawPath)
-        else:
-            writeFile(img, self.baseFile.path, rawPath)
-
+        operation.rawOutputArray = img
         operation.rawOutputPath = rawPath
+        future = _submit_write(rawPath, _write_raw_output, img, rawPath)
+        future.add_done_callback(lambda f: _release_raw_output(operation, img, f))
         return rawPath
 
     def applyStrengthBlending(self, img, operation: AppliedOperation, inputImg):
-        if not operation.supportsStrength() or operation.strength is None or operation.strength >= 1.0:
+        if (
+            not operation.supportsStrength()
+            or operation.strength is None
+            or operation.strength >= 1.0 - _STRENGTH_EPSILON
+        ):
             return img
 
         if inputImg is None:
@@ -269,14 +401,28 @@ class OutputFile(File):
         # Resize input if dimensions don't match (e.g., after upscale)
         if inputImg.shape != img.shape:
             inputImg = cv2.resize(
-                inputImg, (img.shape[1], img.shape[0]), interpolation=cv2.INTER_CUBIC
+                inputImg, (img.shape[1], img.shape[0]), interpolation=_blend_interpolation(inputImg, img)
             )
 
         # Blend: result = strength * model_output + (1 - strength) * input
         strength = operation.strength
+        if strength <= _STRENGTH_EPSILON:
+            return inputImg
         blendedImg = cv2.addWeighted(img, strength, inputImg, 1 - strength, 0)
         return blendedImg
 
+    def applyPostProcessing(self, img, operation: AppliedOperation, inputImg):
+        """Apply strength blending and scaling for a model operation.
+
+        Equivalent to applyScale(applyStrengthBlending(img, ...)), but when downscaling, the model output is
+        scaled first so the blend runs on the smaller image. INTER_AREA resampling is linear, so the two
+        orders differ only by rounding, and the input no longer needs resizing up to the model's output size.
+        """
+        if operation.scale is None or operation.scale >= 1.0:
+            return self.applyStrengthBlending(img, operation, inputImg)
+        img = self.applyScale(img, operation)
+        return self.applyStrengthBlending(img, operation, inputImg)
+
     def reapplyStrength(self, operation: AppliedOperation):
         """Reapply all operations with their current strengths.
 
@@ -284,42 +430,47 @@ class OutputFile(File):
         in sequence since later operations depend on the results of earlier ones.
         """
         # Start with the base file
-        currentImg = cv2.imread(self.baseFile.path, cv2.IMREAD_UNCHANGED)
+        currentImg = read_image(self.baseFile.path)
         if currentImg is None:
             logger.warning(f"Could not read base file: {self.baseFile.path}")
             return False
 
         # Process all operations in sequence
         for op in self.operations:
-            if op.rawOutputPath is None or not os.path.exists(op.rawOutputPath):
-                logger.error(
-                    f"Raw output not found for operation: {op.rawOutputPath}. "
-                    "Cannot rebuild chain."
-                )
-                return False
-
-            # Load this operation's raw output
-            rawImg = cv2.imread(op.rawOutputPath, cv2.IMREAD_UNCHANGED)
+            rawImg = self._loadRawOutput(op)
             if rawImg is None:
-                logger.error(f"Could not read raw output: {op.rawOutputPath}")
                 return False
 
             # Apply post processing
-            blendedImg = self.applyStrengthBlending(rawImg, op, currentImg)
-            blendedImg = self.applyScale(blendedImg, op)
-            currentImg = blendedImg
+            currentImg = self.applyPostProcessing(rawImg, op, currentImg)
 
         # Save the final result
         self.saveImageToCache(currentImg)
         return True
 
+    def _loadRawOutput(self, op: AppliedOperation):
+        if op.rawOutputArray is not None:
+            return op.rawOutputArray
+        if op.rawOutputPath is None or not os.path.exists(op.rawOutputPath):
+            logger.error(
+                f"Raw output not found for operation: {op.rawOutputPath}. "
+                "Cannot rebuild chain."
+            )
+            return None
+        try:
+            if op.rawOutputPath.endswith(".npy"):
+                return np.load(op.rawOutputPath, mmap_mode="r")
+            return read_image(op.rawOutputPath)
+        except (OSError, ValueError) as e:
+            logger.error(f"Could not read raw output: {op.rawOutputPath}: {e}")
+            return None
+
     def saveImageToCache(self, img):
         # Determine path based on applied operations
         rootPath = os.path.normpath(os.path.join(os.getcwd(), ".cache"))
         if not os.path.exists(rootPath):
             os.makedirs(rootPath)
-        baseName = os.path.basename(self.baseFile.path)
-        base, ext = os.path.splitext(baseName)
+        base, ext = self.baseFile.baseNoExt, self.baseFile.ext
         timestamp = time.strftime("%Y%m%d-%H%M%S")
 
         # Build path from all operations
@@ -330,10 +481,7 @@ class OutputFile(File):
         outpath = os.path.join(rootPath, filename)
 
         logger.info(f"Saving {img.dtype} image to cache: {outpath}")
-        if ext.lower() in [".tif", ".tiff"]:
-            writeTiffFile(img, self.baseFile.path, outpath)
-        else:
-            writeFile(img, self.baseFile.path, outpath)
+        _submit_write(outpath, _write_cache_image, img, self.baseFile.path, outpath)
 
         self.setPath(outpath)
         self.saved = False
@@ -341,14 +489,115 @@ class OutputFile(File):
 
     # Copy cached img to the target directory
     def saveImage(self, targetDir):
-        newPath = os.path.join(targetDir, os.path.basename(self.path))
-        shutil.copyfile(self.path, newPath)
+        newPath = os.path.join(targetDir, self.basename)
+        copy_file(self.path, newPath)
         self.saved = True
 
     def setPath(self, path):
         super().setPath(path)
         if self.origPath is None:
-            self.origPath = path
+            self.origPath = self.path
+
+def _blend_interpolation(src: np.ndarray, dst: np.ndarray) -> int:
+    """Pick the resampling filter for resizing a blend input from src's size to dst's."""
+    if src.shape[0] > dst.shape[0] or src.shape[1] > dst.shape[1]:
+        return cv2.INTER_AREA
+    # Bicubic only pays off visually for real upscales (2x or more in both dimensions)
+    if dst.shape[0] >= 2 * src.shape[0] and dst.shape[1] >= 2 * src.shape[1]:
+        return cv2.INTER_CUBIC
+    return cv2.INTER_LINEAR
+
+
+# Cache files are encoded and written in the background so the next operation isn't held up by disk IO.
+# Arrays handed to the pool are never modified afterwards by their producers, so they aren't copied.
+_IO_POOL = ThreadPoolExecutor(max_workers=2, thread_name_prefix="cache-io")
+_pendingWrites = {}
+_pendingWritesLock = threading.Lock()
+
+
+def _submit_write(path: str, fn, *args) -> Future:
+    with _pendingWritesLock:
+        future = _IO_POOL.submit(fn, *args)
+        _pendingWrites[path] = future
+    future.add_done_callback(lambda f: _finish_write(path, f))
+    return future
+
+
+def _finish_write(path: str, future) -> None:
+    error = future.exception()
+    if error is not None:
+        # Keep the failed future registered until wait_for_write has handed its error to a reader
+        logger.error(f"Error writing cache file {path}: {error}")
+        return
+    with _pendingWritesLock:
+        if _pendingWrites.get(path) is future:
+            del _pendingWrites[path]
+
+
+def wait_for_write(path: str) -> None:
+    """Block until a pending background write of path, if any, has finished. Call before reading a cache file.
+
+    Re-raises the error of a failed write of path once; later calls find only what is on disk.
+    """
+    with _pendingWritesLock:
+        future = _pendingWrites.get(path)
+    if future is None:
+        return
+    try:
+        future.result()
+    except Exception:
+        with _pendingWritesLock:
+            if _pendingWrites.get(path) is future:
+                del _pendingWrites[path]
+        raise
+
+
+def _release_raw_output(operation: AppliedOperation, img: np.ndarray, future: Future) -> None:
+    """Drop the in-memory raw output once its .npy is on disk; later loads memory-map the file instead.
+
+    If the write failed the array is kept, as it is the only copy.
+    """
+    if future.exception() is None and operation.rawOutputArray is img:
+        operation.rawOutputArray = None
+
+
+def _write_raw_output(img: np.ndarray, path: str) -> None:
+    np.save(path, img, allow_pickle=False)
+    recordCacheFile(path)
+
+
+def _write_cache_image(img: np.ndarray, sourcePath: str, path: str) -> None:
+    if path.lower().endswith((".tif", ".tiff")):
+        writeTiffFile(img, sourcePath, path)
+    else:
+        writeFile(img, sourcePath, path)
+    recordCacheFile(path)
+
+
+def copy_file(src: str, dst: str) -> None:
+    """Copy src to dst, letting the kernel clone extents where the filesystem supports it.
+
+    On Linux, copy_file_range() reflinks on copy-on-write filesystems (Btrfs, XFS) and copies in-kernel
+    elsewhere. Hardlinks are deliberately avoided: they share the source's mtime, which would make the
+    cache sweep treat fresh copies of old photos as expired.
+    """
+    wait_for_write(src)
+    if hasattr(os, "copy_file_range"):
+        try:
+            with open(src, "rb") as fsrc, open(dst, "wb") as fdst:
+                remaining = os.fstat(fsrc.fileno()).st_size
+                while remaining > 0:
+                    copied = os.copy_file_range(fsrc.fileno(), fdst.fileno(), remaining)
+                    if copied == 0:
+                        break
+                    remaining -= copied
+            if remaining == 0:
+                return
+        except OSError:
+            # Unsupported by this kernel or filesystem pair (ENOSYS, EXDEV, EINVAL, ...)
+            pass
+    shutil.copyfile(src, dst)
+
 
 def _truncate_path(directory: str, filename: str) -> str:
     """Truncate filename if the full path would exceed the safe limit."""
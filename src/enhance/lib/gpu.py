@@ -1,7 +1,20 @@
+import time
+from dataclasses import dataclass
 import torch
 import pynvml
 import psutil
-from typing import List, Tuple
+from typing import List, Optional, Tuple
+
+# Minimum interval between live GPU memory/utilization queries (seconds)
+SAMPLE_INTERVAL = 0.1
+
+
+@dataclass
+class GPUStats:
+    totalBytes: Optional[int] = None
+    freeBytes: Optional[int] = None
+    utilization: Optional[float] = None
+
 
 class GPUInfo:
 
@@ -29,11 +42,26 @@ class GPUInfo:
             self.useNVML = False
             self.nvmlHandle = None
 
-    def getGpuNames(self):
+        # The backend doesn't change during a session, so resolve it once.
+        self.backend = self._backend()
+
+        # Device names don't change during a session, so query the driver once.
+        self.gpuNames = self._queryGpuNames()
+
+        self._lastSample = (0.0, None)
+
+    def _backend(self) -> Optional[str]:
+        if self.mpsAvailable:
+            return "mps"
+        if self.cudaAvailable:
+            return "cuda"
+        return None
+
+    def _queryGpuNames(self):
         try:
-            if self.mpsAvailable:
+            if self.backend == "mps":
                 return [["mps", "Apple Silicon GPU (MPS)"]]
-            if self.cudaAvailable:
+            if self.backend == "cuda":
                 return [
                     [f"cuda:{i}", torch.cuda.get_device_name(i)]
                     for i in range(torch.cuda.device_count())
@@ -42,8 +70,42 @@ class GPUInfo:
             pass
         return []
 
+    def _sampleStats(self) -> Optional[GPUStats]:
+        stats = GPUStats()
+        if self.backend == "mps":
+            try:
+                mem = psutil.virtual_memory()
+                stats.totalBytes, stats.freeBytes = mem.total, mem.available
+            except Exception as e:
+                pass
+        elif self.backend == "cuda":
+            try:
+                stats.freeBytes, stats.totalBytes = torch.cuda.mem_get_info()
+            except Exception as e:
+                pass
+            if self.nvmlHandle:
+                try:
+                    stats.utilization = pynvml.nvmlDeviceGetUtilizationRates(self.nvmlHandle).gpu / 100.0
+                except Exception as e:
+                    pass
+        else:
+            return None
+        return stats
+
+    def _sample(self) -> Optional[GPUStats]:
+        # Every UI refresh calls several getters; share one driver query between them.
+        sampleTime, stats = self._lastSample
+        now = time.monotonic()
+        if stats is None or now - sampleTime >= SAMPLE_INTERVAL:
+            stats = self._sampleStats()
+            self._lastSample = (now, stats)
+        return stats
+
+    def getGpuNames(self):
+        return self.gpuNames
+
     def getGpuPresent(self):
-        return self.cudaAvailable or self.mpsAvailable
+        return self.backend is not None
 
     def getPreferredDevice(self) -> str:
         """Return the preferred device name - GPU if available, otherwise 'cpu'."""
@@ -54,52 +116,28 @@ class GPUInfo:
         return "cpu"
 
     def getGpuMemory(self) -> Tuple[float, float]:  # Return (total GB, available GB)
-        try:
-            if self.mpsAvailable:
-                total_bytes = psutil.virtual_memory().total
-                free_bytes = psutil.virtual_memory().available
-                return float(toGB(total_bytes)), float(toGB(free_bytes))
-            if self.cudaAvailable:
-                free_bytes, total_bytes = torch.cuda.mem_get_info()
-                return float(toGB(total_bytes)), float(toGB(free_bytes))
-        except Exception as e:
-            pass
-        return None
-    
+        stats = self._sample()
+        if stats is None or stats.totalBytes is None:
+            return None
+        return float(toGB(stats.totalBytes)), float(toGB(stats.freeBytes))
+
     def getGpuMemeoryTotal(self) -> float:
-        try:
-            if self.mpsAvailable:
-                total_bytes = psutil.virtual_memory().total
-                return float(toGB(total_bytes))
-            if self.cudaAvailable:
-                free_bytes, total_bytes = torch.cuda.mem_get_info()
-                return float(toGB(total_bytes))
-        except Exception as e:
-            pass
-        return None
-    
+        stats = self._sample()
+        if stats is None or stats.totalBytes is None:
+            return None
+        return float(toGB(stats.totalBytes))
+
     def getGpuMemoryAvailable(self) -> float:
-        try:
-            if self.mpsAvailable:
-                free_bytes = psutil.virtual_memory().available
-                return float(toGB(free_bytes))
-            if self.cudaAvailable:
-                free_bytes, total_bytes = torch.cuda.mem_get_info()
-                return float(toGB(free_bytes))
-        except Exception as e:
-            pass
-        return None
+        stats = self._sample()
+        if stats is None or stats.freeBytes is None:
+            return None
+        return float(toGB(stats.freeBytes))
 
     def getGpuUtilization(self) -> float:
-        try:
-            if self.mpsAvailable:
-                return None
-            if self.cudaAvailable and self.nvmlHandle:
-                gpu_utilization = pynvml.nvmlDeviceGetUtilizationRates(self.nvmlHandle).gpu / 100.0
-                return gpu_utilization
-        except Exception as e:
-            pass
-        return None
+        stats = self._sample()
+        if stats is None:
+            return None
+        return stats.utilization
 
 def toGB(bytes):
     return bytes / (1024 * 1024 * 1024)
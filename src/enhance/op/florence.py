@@ -1,3 +1,6 @@
+import contextlib
+import functools
+import logging
 import os
 
 # Set environment variable to suppress trust_remote_code prompts
@@ -10,6 +13,11 @@ from huggingface_hub import try_to_load_from_cache
 FLORENCE2_MODEL_ID = "microsoft/Florence-2-base"
 TASK_PROMPT = "<OD>"
 
+logger = logging.getLogger(__name__)
+
+# Set once generate() with KV caching fails for this model/transformers combination.
+_kvCacheBroken = False
+
 
 def _is_model_cached(repo_id):
     """Check if a HuggingFace model is already downloaded in the local cache."""
@@ -17,6 +25,32 @@ def _is_model_cached(repo_id):
     return isinstance(result, str)
 
 
+@functools.lru_cache(maxsize=1)
+def _load_florence2(device):
+    """Load Florence-2 once per device and keep it resident for subsequent images."""
+    try:
+        model = AutoModelForCausalLM.from_pretrained(
+            FLORENCE2_MODEL_ID,
+            trust_remote_code=True,
+            torch_dtype="auto",
+            attn_implementation="sdpa",
+        )
+    except (ValueError, ImportError) as e:
+        # Older transformers releases or remote code without SDPA support
+        logger.info(f"SDPA attention unavailable for Florence-2, using eager: {e}")
+        model = AutoModelForCausalLM.from_pretrained(
+            FLORENCE2_MODEL_ID,
+            trust_remote_code=True,
+            torch_dtype="auto",
+            attn_implementation="eager",
+        )
+    model = model.eval().to(device)
+    processor = AutoProcessor.from_pretrained(
+        FLORENCE2_MODEL_ID, trust_remote_code=True
+    )
+    return model, processor
+
+
 class GenerateLabels:
     def __init__(self, device, observable):
         self.device = device
@@ -29,19 +63,7 @@ class GenerateLabels:
             return
         if not _is_model_cached(FLORENCE2_MODEL_ID):
             self.observable.set_status("Downloading Florence-2 model (first run)")
-        self.florence2_model = (
-            AutoModelForCausalLM.from_pretrained(
-                FLORENCE2_MODEL_ID,
-                trust_remote_code=True,
-                torch_dtype="auto",
-                attn_implementation="eager",
-            )
-            .eval()
-            .to(self.device)
-        )
-        self.florence2_processor = AutoProcessor.from_pretrained(
-            FLORENCE2_MODEL_ID, trust_remote_code=True
-        )
+        self.florence2_model, self.florence2_processor = _load_florence2(self.device)
         self.observable.set_status(None)
 
     def run(self, img):
@@ -72,18 +94,41 @@ def _run_florence2(task_prompt, text_input, model, processor, image):
         pil_image = image
         image_size = (image.width, image.height)
 
-    inputs = processor(text=prompt, images=pil_image, return_tensors="pt").to(
-        device, torch.float16
-    )
-    generated_ids = model.generate(
-        input_ids=inputs["input_ids"].to(device),
-        pixel_values=inputs["pixel_values"].to(device),
-        max_new_tokens=1024,
-        do_sample=False,
-        use_cache=False,  # Disable caching to avoid past_key_values issues
-    )
+    inputs = processor(text=prompt, images=pil_image, return_tensors="pt")
+    # Move each tensor once; only floating point inputs take the model's dtype, token ids stay int64
+    inputs = {
+        k: v.to(device, model.dtype) if v.is_floating_point() else v.to(device)
+        for k, v in inputs.items()
+    }
+    generated_ids = _generate(model, inputs, device)
     generated_text = processor.batch_decode(generated_ids, skip_special_tokens=False)[0]
     parsed_answer = processor.post_process_generation(
         generated_text, task=task_prompt, image_size=image_size
     )
     return parsed_answer
+
+
+def _generate(model, inputs, device):
+    global _kvCacheBroken
+    autocast = (
+        torch.autocast(device.type, dtype=torch.float16)
+        if device.type == "cuda"
+        else contextlib.nullcontext()
+    )
+    kwargs = dict(
+        input_ids=inputs["input_ids"],
+        pixel_values=inputs["pixel_values"],
+        max_new_tokens=1024,
+        do_sample=False,
+        num_beams=1,
+        early_stopping=True,
+    )
+    with torch.inference_mode(), autocast:
+        if not _kvCacheBroken:
+            try:
+                return model.generate(**kwargs, use_cache=True)
+            except (AttributeError, TypeError) as e:
+                # Some transformers releases break Florence-2's remote code when past_key_values is used
+                logger.warning(f"Florence-2 KV cache unsupported, generating without it: {e}")
+                _kvCacheBroken = True
+        return model.generate(**kwargs, use_cache=False)
@@ -1,3 +1,4 @@
+import numpy as np
 from PIL import Image
 
 from enhance.lib.file import File, Mask
@@ -12,24 +13,39 @@ class GenerateMasks(Observable):
         super().__init__()
 
         self.device = device
+        # Built on first use; the underlying models are cached per device at module level
+        self._florence = None
+        self._sam = None
+
+    @property
+    def labelGenerator(self) -> florence.GenerateLabels:
+        if self._florence is None:
+            self._florence = florence.GenerateLabels(self.device, observable=self)
+        return self._florence
+
+    @property
+    def maskGenerator(self) -> sam.GenerateMasks:
+        if self._sam is None:
+            self._sam = sam.GenerateMasks(self.device, observable=self)
+        return self._sam
 
     def run(self, inFile: File):
         self.startJob(2)
 
         img = Image.open(inFile.path).convert("RGB")
+        # Convert once for SAM2; Florence-2's processor takes the PIL image as is
+        img_np = np.asarray(img)
 
-        gen_labels = florence.GenerateLabels(self.device, observable=self)
-        label_results = gen_labels.run(img)
+        label_results = self.labelGenerator.run(img)
         self.updateJob(1)
 
         if len(label_results['bboxes']) == 0:
             return False
 
-        gen_masks = sam.GenerateMasks(self.device, observable=self)
-        mask_results = gen_masks.run(img, label_results['bboxes'], label_results['labels'])
+        mask_results = self.maskGenerator.run(img_np, label_results['bboxes'], label_results['labels'])
 
         if len(mask_results['masks']) > 0:
-            inFile.masks = []
+            inFile.clearMasks()
             for i in range(len(mask_results['masks'])):
                 mask = Mask(
                     score=mask_results['scores'][i],
@@ -1,8 +1,11 @@
+import functools
+from importlib.util import find_spec
+import logging
 import os
-import cv2
 import numpy as np
+import torch
 from typing import List
-from enhance.lib.file import File, OutputFile, Operation, Mask
+from enhance.lib.file import File, OutputFile, Operation, Mask, read_image
 from enhance.lib.util import Observable
 from enhance.op.simple_tile_processor import TileProcessor
 
@@ -12,6 +15,42 @@ import spandrel_extra_arches
 spandrel_extra_arches.install()
 
 
+# Number of loaded models kept in memory (on their target device) for reuse across runs
+MODEL_CACHE_SIZE = 4
+
+# Set ENHANCE_TORCH_COMPILE=1 to run models through torch.compile on CUDA. Off by default: compiling takes
+# a while on first use and not every architecture spandrel supports compiles cleanly.
+TORCH_COMPILE = os.environ.get("ENHANCE_TORCH_COMPILE", "0") == "1"
+
+logger = logging.getLogger(__name__)
+
+
+@functools.lru_cache(maxsize=MODEL_CACHE_SIZE)
+def _load_model(modelPath: str, mtime: float, device: str) -> ImageModelDescriptor:
+    """Load a model and move it to device. mtime is part of the key so a replaced file is reloaded."""
+    model = ModelLoader().load_from_file(modelPath)
+    assert isinstance(model, ImageModelDescriptor)
+    model.to(device)
+    model.eval()
+    if TORCH_COMPILE and device.startswith("cuda"):
+        _compile_model(model)
+    return model
+
+
+def _compile_model(model: ImageModelDescriptor) -> None:
+    """Swap the descriptor's network for a compiled version. Cached with the model, so it compiles once per load."""
+    if find_spec("triton") is None:
+        logger.warning("ENHANCE_TORCH_COMPILE is set but triton is not installed; running uncompiled")
+        return
+    # Tiles are padded to a fixed size, so shapes are static: specialize kernels for them (dynamic=False) and
+    # let CUDA graphs be replayed per batch
+    model._model = torch.compile(model._model, mode="reduce-overhead", fullgraph=False, dynamic=False)
+
+
+def load_model(modelPath: str, device: str) -> ImageModelDescriptor:
+    return _load_model(modelPath, os.path.getmtime(modelPath), device)
+
+
 def combine_masks(masks: List[Mask]) -> np.ndarray:
     """Combine multiple masks into a single binary mask."""
     if not masks:
@@ -24,6 +63,9 @@ def combine_masks(masks: List[Mask]) -> np.ndarray:
     # Determine shape from first mask
     shape = masks[0].mask.shape
 
+    if all(_is_binary_mask(m.mask) for m in masks):
+        return _combine_binary_masks(inside_masks, outside_masks, shape)
+
     # Combine inside masks
     if inside_masks:
         combined = np.zeros(shape, dtype=np.float32)
@@ -48,6 +90,27 @@ def combine_masks(masks: List[Mask]) -> np.ndarray:
     return combined
 
 
+def _is_binary_mask(mask: np.ndarray) -> bool:
+    if mask.dtype == np.bool_:
+        return True
+    return np.issubdtype(mask.dtype, np.integer) and mask.max() <= 1
+
+
+def _combine_binary_masks(inside_masks: List[Mask], outside_masks: List[Mask], shape) -> np.ndarray:
+    """Combine 0/1 masks with boolean logic, converting to float32 only once at the end."""
+    if inside_masks:
+        combined = np.zeros(shape, dtype=np.bool_)
+        for mask in inside_masks:
+            np.logical_or(combined, mask.mask, out=combined)
+    else:
+        combined = np.ones(shape, dtype=np.bool_)
+
+    for mask in outside_masks:
+        combined &= np.logical_not(mask.mask)
+
+    return combined.astype(np.float32)
+
+
 class ModelRunner(Observable):
 
     def __init__(
@@ -83,8 +146,7 @@ class ModelRunner(Observable):
         operation: Operation = Operation.Sharpen,
         masks: List[Mask] = None,
     ):
-        model = ModelLoader().load_from_file(self.modelPath)
-        assert isinstance(model, ImageModelDescriptor)
+        model = load_model(self.modelPath, self.device)
 
         # Combine masks if provided
         combinedMask = combine_masks(masks) if masks else None
@@ -100,7 +162,7 @@ class ModelRunner(Observable):
         )
 
         imgPath = inFile.path
-        img = cv2.imread(imgPath, cv2.IMREAD_UNCHANGED)
+        img = read_image(imgPath)
         output = processor.process_image(img)
         if output is None:
             return None
@@ -122,14 +184,9 @@ class ModelRunner(Observable):
         # Save the raw model output for chain rebuilding
         outputFile.saveRawModelOutput(output, modelOp)
 
-        # Apply strength blending if supported
-        if modelOp.supportsStrength():
-            # Apply strength blending against the input image
-            inputImg = cv2.imread(inFile.path, cv2.IMREAD_UNCHANGED)
-            output = outputFile.applyStrengthBlending(output, modelOp, inputImg)
-
-        # Apply scaling if needed
-        output = outputFile.applyScale(output, modelOp)
+        # Apply strength blending against the input image, and scaling if needed
+        inputImg = read_image(inFile.path) if modelOp.supportsStrength() else None
+        output = outputFile.applyPostProcessing(output, modelOp, inputImg)
         outputFile.saveImageToCache(output)
 
         return outputFile
@@ -141,8 +198,7 @@ class ModelRunner(Observable):
         masks: List[Mask] = None,
     ):
         """Run model on an existing OutputFile and update it in place"""
-        model = ModelLoader().load_from_file(self.modelPath)
-        assert isinstance(model, ImageModelDescriptor)
+        model = load_model(self.modelPath, self.device)
 
         # Combine masks if provided
         combinedMask = combine_masks(masks) if masks else None
@@ -158,7 +214,7 @@ class ModelRunner(Observable):
         )
 
         imgPath = outputFile.path
-        img = cv2.imread(imgPath, cv2.IMREAD_UNCHANGED)
+        img = read_image(imgPath)
         output = processor.process_image(img)
         if output is None:
             return None
@@ -186,14 +242,9 @@ class ModelRunner(Observable):
         # Save the raw model output for chain rebuilding
         outputFile.saveRawModelOutput(output, modelOp)
 
-        # Apply strength blending if supported
-        if modelOp.supportsStrength():
-            # Apply strength blending against the previous output (result of prior operations)
-            inputImg = cv2.imread(inputPath, cv2.IMREAD_UNCHANGED)
-            output = outputFile.applyStrengthBlending(output, modelOp, inputImg)
-
-        # Apply scaling if needed
-        output = outputFile.applyScale(output, modelOp)
+        # Apply strength blending against the previous output (result of prior operations), and scaling if needed
+        inputImg = read_image(inputPath) if modelOp.supportsStrength() else None
+        output = outputFile.applyPostProcessing(output, modelOp, inputImg)
 
         # Save the (possibly blended/scaled) model output to cache
         outputFile.saveImageToCache(output)
@@ -1,3 +1,5 @@
+import functools
+
 from sam2.build_sam import build_sam2_hf
 from sam2.sam2_image_predictor import SAM2ImagePredictor
 from huggingface_hub import try_to_load_from_cache
@@ -14,37 +16,59 @@ def _is_model_cached(repo_id):
     return isinstance(result, str)
 
 
+@functools.lru_cache(maxsize=1)
+def _get_predictor(device):
+    """Build the SAM2 predictor once per device and keep it resident for subsequent images."""
+    sam2_model = build_sam2_hf(SAM_TYPE, device=device)
+    return SAM2ImagePredictor(sam2_model)
+
+
 class GenerateMasks:
     def __init__(self, device, observable=None):
         self.device = device
         self.observable = observable
+        self.sam2_predictor = None
 
-    def run(self, image, input_boxes, labels):
+    def _load_model(self):
+        if self.sam2_predictor is not None:
+            return
         if self.observable:
             if not _is_model_cached(SAM_TYPE):
                 self.observable.set_status("Downloading SAM2 model (first run)")
-        sam2_model = build_sam2_hf(SAM_TYPE, device=self.device)
-        sam2_predictor = SAM2ImagePredictor(sam2_model)
+        self.sam2_predictor = _get_predictor(self.device)
         if self.observable:
             self.observable.set_status(None)
 
+    def run(self, image, input_boxes, labels):
+        self._load_model()
+        sam2_predictor = self.sam2_predictor
+
         masks = []
         scores = []
 
-        for input_box in input_boxes:
-            sam2_predictor.set_image(np.array(image))
-            mask, score, _ = sam2_predictor.predict(
+        # Encode the image once; the embedding is reused for every box prompt
+        sam2_predictor.set_image(image if isinstance(image, np.ndarray) else np.asarray(image))
+        if len(input_boxes) > 0:
+            # Decode all boxes in one batched call rather than one predict() per box
+            boxes = np.atleast_2d(np.asarray(input_boxes, dtype=np.float32))
+            batchMasks, batchScores, _ = sam2_predictor.predict(
                 point_coords=None,
                 point_labels=None,
-                box=input_box,
+                box=boxes,
                 multimask_output=False,
             )
-            if mask is None or score is None or len(mask) == 0 or len(score) == 0:
-                masks.append(None)
-                scores.append(None)
-            else:
-                masks.append(mask[0])
-                scores.append(score[0])
+            # A single box comes back without the batch dimension: (1, H, W) / (1,)
+            if batchMasks is not None and batchMasks.ndim == 3:
+                batchMasks = batchMasks[np.newaxis]
+                batchScores = np.asarray(batchScores)[np.newaxis]
+            for i in range(len(boxes)):
+                if batchMasks is None or batchScores is None or i >= len(batchMasks):
+                    masks.append(None)
+                    scores.append(None)
+                else:
+                    # SAM2 returns thresholded 0/1 masks as float32; store them as bool
+                    masks.append(batchMasks[i][0].astype(np.bool_))
+                    scores.append(batchScores[i][0])
 
         return {
             "masks": masks,
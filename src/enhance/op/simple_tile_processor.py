@@ -1,10 +1,37 @@
+import logging
 import math
+import os
+import time
 import numpy as np
 import torch
 from torch.nn import functional as F
 
 from enhance.lib.util import Observable
 
+logger = logging.getLogger(__name__)
+
+# Mask values this close to 1 count as fully selected
+MASK_EPSILON = 1e-6
+
+# Filter for upscaling the original image where the mask leaves it visible. Bilinear reads 2x2 source
+# pixels per output pixel against bicubic's 4x4, and these regions are unselected background.
+ORIGINAL_UPSCALE_MODE = "bilinear"
+
+# Progress is reported to the observer after this many tiles or this many seconds, whichever comes first
+PROGRESS_TILES = 16
+PROGRESS_INTERVAL = 0.05
+
+# Upper bound on tiles per model forward pass
+MAX_TILE_BATCH = 8
+# Rough multiple of a tile's input+output bytes that a super-resolution network needs for activations
+ACTIVATION_FACTOR = 32
+# Fraction of free device memory a tile batch may claim
+BATCH_MEMORY_FRACTION = 0.5
+
+# Set ENHANCE_CUDA_GRAPH=1 to replay tile batches as a captured CUDA graph. Off by default: capturing costs
+# two warm-up passes plus the capture before the first batch, which only pays off over many full batches.
+CUDA_GRAPH = os.environ.get("ENHANCE_CUDA_GRAPH", "0") == "1"
+
 
 class TileProcessor:
 
@@ -17,19 +44,35 @@ class TileProcessor:
         device=None,
         observer: Observable = None,
         mask: np.ndarray = None,
+        batchSize: int = None,
     ):
         self.model = model
         self.tileSize = tileSize
         self.tilePad = tilePad
+        # Tiles per forward pass; None picks one from free device memory
+        self.batchSize = batchSize
 
         self.device = "cpu" if device is None else device
-        self.model.to(self.device)
-        self.model.eval()
+        # Models from ModelRunner's load cache are already on the device in eval mode; only move or switch
+        # modes when a caller hands over one that isn't
+        param = next(self.model.model.parameters(), None)
+        if param is not None and param.device != torch.device(self.device):
+            self.model.to(self.device)
+        if self.model.model.training:
+            self.model.eval()
+        # cuDNN picks faster NHWC kernels for reduced-precision convolutions, and an NHWC output converts
+        # to an HWC numpy image without a transposing copy
+        self.memoryFormat = torch.channels_last if str(self.device).startswith("cuda") else torch.contiguous_format
+        if self.memoryFormat == torch.channels_last:
+            self.model.model.to(memory_format=self.memoryFormat)
 
         self.dtype = None
         self.img_tensor = None
         self.imgXPad = 0
         self.imgYPad = 0
+        # Image size after padding to a multiple of tile_size, excluding the tile_pad context border
+        self.paddedH = 0
+        self.paddedW = 0
 
         self.scale = scale
 
@@ -40,6 +83,20 @@ class TileProcessor:
         self.mask_tensor = None
         # Precomputed tile occupancy map (True = tile has mask pixels)
         self.tile_occupancy = None
+        # Precomputed full-coverage map (True = every pixel of the tile is masked, so no blending is needed)
+        self.tile_full = None
+        # Staging buffer that tile batches are copied into before each forward pass
+        self._tileBuf = None
+        # Replay the forward pass as a CUDA graph to skip per-kernel launch overhead (opt-in, see CUDA_GRAPH).
+        # Not used for models already compiled with torch.compile, which manages its own graphs.
+        self.useCudaGraph = (
+            CUDA_GRAPH
+            and str(self.device).startswith("cuda")
+            and not hasattr(self.model.model, "_orig_mod")
+        )
+        self._graph = None
+        self._graphOut = None
+        self._graphSize = 0
 
     def preprocess_img(self):
         # img size should be a multiple of tile size
@@ -53,19 +110,33 @@ class TileProcessor:
         y2 = self.imgYPad - y1
 
         self.img_tensor = F.pad(self.img_tensor, (x1, x2, y1, y2), 'reflect')
+        self.paddedH, self.paddedW = h + self.imgYPad, w + self.imgXPad
+
+        # Add tile_pad of context around the image, plus enough at the bottom and right for the last row and
+        # column of tiles, so preprocess_tile can take every tile as a plain slice
+        actualTileSize = self.tileSize - (self.tilePad * 2)
+        extraX = math.ceil(self.paddedW / actualTileSize) * actualTileSize - self.paddedW
+        extraY = math.ceil(self.paddedH / actualTileSize) * actualTileSize - self.paddedH
+        self.img_tensor = F.pad(
+            self.img_tensor,
+            (self.tilePad, self.tilePad + extraX, self.tilePad, self.tilePad + extraY),
+            'reflect',
+        ).contiguous(memory_format=self.memoryFormat)
+
+        # A mask that covers the whole image selects everything: process as if there were no mask
+        if self.mask is not None and self.mask.min() >= 1.0 - MASK_EPSILON:
+            self.mask = None
 
         # Also pad the mask if it exists
         if self.mask is not None:
-            # Convert mask to tensor and add batch/channel dimensions, move to device
-            mask_t = (
-                torch.from_numpy(self.mask.astype(np.float32))
-                .unsqueeze(0)
-                .unsqueeze(0)
-                .to(self.device)
-            )
+            # Convert mask to tensor and add batch/channel dimensions, move to device. combine_masks already
+            # returns float32, so this avoids the copy astype would make.
+            mask = np.ascontiguousarray(self.mask, dtype=np.float32)
+            mask_t = torch.from_numpy(mask).to(self.device).unsqueeze(0).unsqueeze(0)
             self.mask_tensor = F.pad(mask_t, (x1, x2, y1, y2), "constant", 0)
-            # Precompute tile occupancy map to avoid per-tile reductions
-            self._compute_tile_occupancy()
+            # Precompute tile occupancy map to avoid per-tile reductions. For coverage, padding counts as
+            # covered: it is cropped from the result, so only the image area decides whether to blend.
+            self._compute_tile_occupancy(F.pad(mask_t, (x1, x2, y1, y2), "constant", 1))
 
     def postprocess_result(self, img_tensor):
         # remove padding
@@ -76,59 +147,20 @@ class TileProcessor:
         y1 = (self.imgYPad // 2) * self.scale
         y2 = self.imgYPad * self.scale - y1
 
-        result = img_tensor[:, :, y1:h - y2, x1:w - x2]
+        result = img_tensor.narrow(2, y1, h - y1 - y2).narrow(3, x1, w - x1 - x2)
 
         return result
 
     def preprocess_tile(self, y, x):
+        # preprocess_img padded the image so every tile, edges included, is an in-bounds slice of tile_size
         actualTileSize = self.tileSize - (self.tilePad * 2)
-
-        y1 = max(y * actualTileSize - self.tilePad, 0)
-        y2 = (y + 1) * actualTileSize + self.tilePad
-        x1 = max(x * actualTileSize - self.tilePad, 0)
-        x2 = (x + 1) * actualTileSize + self.tilePad
-
-        tile = self.img_tensor[:, :, y1:y2, x1:x2]
-
-        # Pad tiles to match tile_size
-        tile_padY1 = 0
-        tile_padY2 = 0
-        tile_padX1 = 0
-        tile_padX2 = 0
-
-        # Shape is B, C, H, W
-        if tile.shape[2] < self.tileSize:
-            if y1 == 0:
-                tile_padY1 = self.tileSize-tile.shape[2]
-            else:
-                tile_padY2 = self.tileSize-tile.shape[2]
-                if tile_padY2 > tile.shape[2]:
-                    tile_padY2 = tile.shape[2]-1
-
-        if tile.shape[3] < self.tileSize:
-            if x1 == 0:
-                tile_padX1 = self.tileSize-tile.shape[3]
-            else:
-                tile_padX2 = self.tileSize-tile.shape[3]
-                if tile_padX2 > tile.shape[3]:
-                    tile_padX2 = tile.shape[3]-1
-
-        tile = F.pad(tile, (tile_padX1, tile_padX2, tile_padY1, tile_padY2), 'reflect')
-
-        # Padding with 'reflect' fails when the padding size exceeds the tile size on a given dimension. So when padding size would be too large, pad the maximum size with relfection, then pad the rest with 'constant'.
-        # Applies to remainder at right at bottom edges.
-        if tile.shape[2] < self.tileSize or tile.shape[3] < self.tileSize:
-            tile_padY1 = 0
-            tile_padX1 = 0
-            tile_padY2 = self.tileSize-tile.shape[2]
-            tile_padX2 = self.tileSize-tile.shape[3]
-            tile = F.pad(tile, (tile_padX1, tile_padX2, tile_padY1, tile_padY2), 'constant')
-
-        return tile
+        y1 = y * actualTileSize
+        x1 = x * actualTileSize
+        return self.img_tensor[:, :, y1:y1 + self.tileSize, x1:x1 + self.tileSize]
 
     def process_image(self, img):
         self.dtype = img.dtype
-        self.img_tensor = self.img2tensor(img).to(self.device)
+        self.img_tensor = self.img2tensor(img)
 
         self.preprocess_img()
         out_tensor = self.process_tiles()
@@ -139,8 +171,8 @@ class TileProcessor:
 
         return output_img
 
-    def _compute_tile_occupancy(self):
-        """Precompute which tiles contain mask pixels (single device sync)."""
+    def _compute_tile_occupancy(self, coverage_tensor):
+        """Precompute which tiles contain mask pixels, and which are fully covered (single device sync)."""
         if self.mask_tensor is None:
             return
 
@@ -149,18 +181,18 @@ class TileProcessor:
         xtiles = math.ceil(w / actual_tile_size)
         ytiles = math.ceil(h / actual_tile_size)
 
-        # Build occupancy grid on device, then transfer once
-        occupancy = torch.zeros((ytiles, xtiles), dtype=torch.bool, device=self.device)
-        for y in range(ytiles):
-            for x in range(xtiles):
-                y1 = y * actual_tile_size
-                y2 = min((y + 1) * actual_tile_size, h)
-                x1 = x * actual_tile_size
-                x2 = min((x + 1) * actual_tile_size, w)
-                occupancy[y, x] = (self.mask_tensor[:, :, y1:y2, x1:x2] > 0).any()
-
-        # Single device sync: transfer to CPU
-        self.tile_occupancy = occupancy.cpu().numpy()
+        # One max-pool over the whole mask gives the per-tile maximum; ceil_mode covers partial edge tiles.
+        # The grid is transferred to the CPU once.
+        tile_max = F.max_pool2d(
+            self.mask_tensor, kernel_size=actual_tile_size, stride=actual_tile_size, ceil_mode=True
+        )
+        occupancy = (tile_max[0, 0] > 0)[:ytiles, :xtiles]
+        # Min-pool via max-pool of the negation
+        tile_min = -F.max_pool2d(
+            -coverage_tensor, kernel_size=actual_tile_size, stride=actual_tile_size, ceil_mode=True
+        )
+        full = (tile_min[0, 0] >= 1.0 - MASK_EPSILON)[:ytiles, :xtiles]
+        self.tile_occupancy, self.tile_full = torch.stack((occupancy, full)).cpu().numpy()
 
     def _tile_has_mask_pixels(self, y: int, x: int) -> bool:
         """Check if a tile contains any mask pixels using precomputed occupancy map."""
@@ -168,38 +200,53 @@ class TileProcessor:
             return True  # No mask means process all tiles
         return bool(self.tile_occupancy[y, x])
 
-    @torch.no_grad()
+    @torch.inference_mode()
     def process_tiles(self):
         actual_tile_size = self.tileSize - (self.tilePad * 2)
         scaled_tile_size = actual_tile_size * self.scale
         scaled_tile_pad = self.tilePad * self.scale
-        b, c, h, w = self.img_tensor.shape
+        h, w = self.paddedH, self.paddedW
         xtiles = math.ceil(w / actual_tile_size)
         ytiles = math.ceil(h / actual_tile_size)
         if not self.observer is None:
             self.observer.startJob(xtiles * ytiles)
+        self._pendingProgress = 0
+        self._lastProgressTime = time.monotonic()
+
+        output_tensor = torch.zeros(
+            (1, 3, h*self.scale, w*self.scale), dtype=torch.float32, device=self.device
+        ).contiguous(memory_format=self.memoryFormat)
+
+        def paste(y, x, processed_tile):
+            px = x * scaled_tile_size
+            py = y * scaled_tile_size
 
-        output_tensor = torch.zeros((1, 3, h*self.scale, w*self.scale), dtype=torch.float32).to(self.device)
-
-        # If we have a mask, also keep a copy of the original scaled up for non-masked regions
-        if self.mask_tensor is not None:
-            # Scale up input tensor to output size for blending non-masked regions
-            original_scaled = F.interpolate(
-                self.img_tensor,
-                scale_factor=self.scale,
-                mode="bicubic",
-                align_corners=False,
-            )
-            # Also scale up the mask
-            mask_scaled = F.interpolate(
-                self.mask_tensor, scale_factor=self.scale, mode="nearest"
-            )
+            # Trim tiles that exceed the image boundary (right and bottom edges)
+            trimmed_scaled_tile_size_x = min(scaled_tile_size, output_tensor.shape[3] - px)
+            trimmed_scaled_tile_size_y = min(scaled_tile_size, output_tensor.shape[2] - py)
+
+            # Remove tile padding and trim, as views
+            processed_tile = processed_tile.narrow(2, scaled_tile_pad, trimmed_scaled_tile_size_y) \
+                                           .narrow(3, scaled_tile_pad, trimmed_scaled_tile_size_x)
+            target = output_tensor.narrow(2, py, trimmed_scaled_tile_size_y).narrow(3, px, trimmed_scaled_tile_size_x)
+
+            # Apply mask blending: only keep model output within masked regions
+            if self.mask_tensor is not None and not self.tile_full[y, x]:
+                # Blend: output = mask * model_output + (1 - mask) * original
+                #              = original + mask * (model_output - original)
+                original = self._scaled_original(py, px, trimmed_scaled_tile_size_y, trimmed_scaled_tile_size_x)
+                mask = self._scaled_mask(py, px, trimmed_scaled_tile_size_y, trimmed_scaled_tile_size_x)
+                processed_tile = torch.addcmul(original, mask, processed_tile.float() - original)
+
+            # copy_ also widens reduced-precision model output into the float32 output
+            target.copy_(processed_tile)
+
+        batchSize = self.batchSize or self._estimate_batch_size()
+        # Tiles waiting for the next batched forward pass, as (y, x, tile)
+        pending = []
 
         for y in range(ytiles):
             for x in range(xtiles):
-                if self.observer is not None and self.observer.shouldInterrupt():
-                    return None
-
                 # Skip tiles with no mask pixels (optimization)
                 if not self._tile_has_mask_pixels(y, x):
                     # Copy original pixels for this tile region
@@ -208,60 +255,195 @@ class TileProcessor:
                         py = y * scaled_tile_size
                         trimmed_x = min(scaled_tile_size, output_tensor.shape[3] - px)
                         trimmed_y = min(scaled_tile_size, output_tensor.shape[2] - py)
-                        output_tensor[
-                            :, :, py : py + trimmed_y, px : px + trimmed_x
-                        ] = original_scaled[
-                            :, :, py : py + trimmed_y, px : px + trimmed_x
-                        ]
-                    if self.observer is not None:
-                        self.observer.updateJob(1)
+                        output_tensor.narrow(2, py, trimmed_y).narrow(3, px, trimmed_x).copy_(
+                            self._scaled_original(py, px, trimmed_y, trimmed_x)
+                        )
+                    self._report_progress(1)
                     continue
 
                 # Get tile, padded to tile_size + tile_pad
-                tile = self.preprocess_tile(y, x)
-                processed_tile = self.model(tile)
-                # Remove tile padding
-                processed_tile = processed_tile[:, :,
-                                                scaled_tile_pad:scaled_tile_pad+scaled_tile_size,
-                                                scaled_tile_pad:scaled_tile_pad+scaled_tile_size]
-
-                px = x * scaled_tile_size
-                py = y * scaled_tile_size
-
-                # Trim tiles that exceed the image boundary (right and bottom edges)
-                trimmed_scaled_tile_size_x = scaled_tile_size
-                trimmed_scaled_tile_size_y = scaled_tile_size
-                if px + scaled_tile_size > output_tensor.shape[3]:
-                    trimmed_scaled_tile_size_x = output_tensor.shape[3] - px
-                if py + scaled_tile_size > output_tensor.shape[2]:
-                    trimmed_scaled_tile_size_y = output_tensor.shape[2] - py
-                output_tensor[:, :, py:py+trimmed_scaled_tile_size_y, px:px+trimmed_scaled_tile_size_x] = \
-                    processed_tile[:, :, 0:trimmed_scaled_tile_size_y, 0:trimmed_scaled_tile_size_x]
-
-                if self.observer is not None:
-                    self.observer.updateJob(1)
-
-        # Apply mask blending: only keep model output within masked regions
-        if self.mask_tensor is not None:
-            # Blend: output = mask * model_output + (1 - mask) * original
-            output_tensor = (
-                mask_scaled * output_tensor + (1 - mask_scaled) * original_scaled
-            )
+                pending.append((y, x, self.preprocess_tile(y, x)))
+                if len(pending) < batchSize:
+                    continue
+
+                if self.observer is not None and self.observer.shouldInterrupt():
+                    return None
+                batchSize = self._run_batch(pending, batchSize, paste)
+                pending = []
+
+        if pending:
+            if self.observer is not None and self.observer.shouldInterrupt():
+                return None
+            self._run_batch(pending, batchSize, paste)
+        self._flush_progress()
 
         return output_tensor
 
+    def _scaled_original(self, py: int, px: int, th: int, tw: int):
+        """Upscale of the input covering output region (py, px, th, tw), for pixels outside the mask.
+
+        Only the source region plus a small margin is upscaled, so no output-sized copy of the input is
+        needed. The margin covers the filter's support, so results match upscaling the whole image.
+        """
+        margin = 2
+        h, w = self.paddedH, self.paddedW
+        sy, sx = py // self.scale, px // self.scale
+        sh, sw = math.ceil(th / self.scale), math.ceil(tw / self.scale)
+        y1, y2 = max(sy - margin, 0), min(sy + sh + margin, h)
+        x1, x2 = max(sx - margin, 0), min(sx + sw + margin, w)
+        # Stay inside the image proper: interpolation clamps at its edges, not at the tile_pad context border
+        p = self.tilePad
+        scaled = F.interpolate(
+            self.img_tensor[:, :, p + y1:p + y2, p + x1:p + x2],
+            scale_factor=self.scale,
+            mode=ORIGINAL_UPSCALE_MODE,
+            align_corners=False,
+        )
+        oy, ox = (sy - y1) * self.scale, (sx - x1) * self.scale
+        return scaled[:, :, oy:oy + th, ox:ox + tw]
+
+    def _scaled_mask(self, py: int, px: int, th: int, tw: int):
+        """Nearest-neighbour upscale of the mask covering output region (py, px, th, tw)."""
+        sy, sx = py // self.scale, px // self.scale
+        sh, sw = math.ceil(th / self.scale), math.ceil(tw / self.scale)
+        scaled = F.interpolate(
+            self.mask_tensor[:, :, sy:sy + sh, sx:sx + sw], scale_factor=self.scale, mode="nearest"
+        )
+        return scaled[:, :, :th, :tw]
+
+    def _run_batch(self, pending, batchSize, paste) -> int:
+        """Run pending tiles through the model in one forward pass and paste the results.
+
+        Returns the batch size to use from now on: on an out-of-memory error the batch is split in half
+        and retried, and the smaller size sticks for the rest of the image.
+        """
+        try:
+            batch = self._tile_batch(len(pending))
+            for i, (_, _, tile) in enumerate(pending):
+                batch[i].copy_(tile[0])
+            processed = self._forward(batch)
+        except torch.cuda.OutOfMemoryError:
+            if len(pending) == 1:
+                raise
+            batch = None
+            torch.cuda.empty_cache()
+            half = len(pending) // 2
+            batchSize = self._run_batch(pending[:half], half, paste)
+            return min(batchSize, self._run_batch(pending[half:], half, paste))
+
+        for i, (y, x, _) in enumerate(pending):
+            paste(y, x, processed[i:i+1])
+        self._report_progress(len(pending))
+        return batchSize
+
+    def _forward(self, batch):
+        """Run the model on a staged batch, replaying a captured CUDA graph for full-size batches.
+
+        The graph reads from the staging buffer and writes to a static output, so the result is only valid
+        until the next call; paste copies it out before then.
+        """
+        if not self.useCudaGraph:
+            return self.model(batch)
+        if self._graph is None or self._graphSize != batch.shape[0]:
+            if self._graph is not None:
+                # Batch size changed (last partial batch, or halved after an OOM): leave the graph for the
+                # common size and run this batch eagerly
+                return self.model(batch)
+            try:
+                self._capture_graph(batch)
+            except torch.cuda.OutOfMemoryError:
+                self._graph = None
+                raise
+            except RuntimeError as e:
+                # Models with host syncs or data-dependent control flow can't be captured
+                logger.info(f"CUDA graph capture failed, running tiles eagerly: {e}")
+                self.useCudaGraph = False
+                self._graph = None
+                return self.model(batch)
+        self._graph.replay()
+        return self._graphOut
+
+    def _capture_graph(self, batch):
+        # Warm up on a side stream so one-time allocations and cuDNN autotuning stay out of the graph
+        stream = torch.cuda.Stream()
+        stream.wait_stream(torch.cuda.current_stream())
+        with torch.cuda.stream(stream):
+            for _ in range(2):
+                self.model(batch)
+        torch.cuda.current_stream().wait_stream(stream)
+
+        # Keep the caller's autocast settings, but without the cast cache: cached weight casts made during
+        # capture would be freed after it while the graph still reads them
+        graph = torch.cuda.CUDAGraph()
+        with torch.autocast(
+            device_type="cuda",
+            dtype=torch.get_autocast_dtype("cuda"),
+            enabled=torch.is_autocast_enabled("cuda"),
+            cache_enabled=False,
+        ):
+            with torch.cuda.graph(graph):
+                self._graphOut = self.model(batch)
+        self._graph = graph
+        self._graphSize = batch.shape[0]
+
+    def _report_progress(self, tiles: int):
+        """Accumulate finished tiles and notify the observer at most every PROGRESS_TILES tiles or PROGRESS_INTERVAL."""
+        self._pendingProgress += tiles
+        if (
+            self._pendingProgress >= PROGRESS_TILES
+            or time.monotonic() - self._lastProgressTime >= PROGRESS_INTERVAL
+        ):
+            self._flush_progress()
+
+    def _flush_progress(self):
+        if self.observer is not None and self._pendingProgress:
+            self.observer.updateJob(self._pendingProgress)
+        self._pendingProgress = 0
+        self._lastProgressTime = time.monotonic()
+
+    def _tile_batch(self, n: int):
+        """Return a (n, 3, tileSize, tileSize) view of a staging buffer that is reused for every batch."""
+        if self._tileBuf is None or self._tileBuf.shape[0] < n:
+            # A captured graph reads from the old buffer's address
+            self._graph = None
+            self._tileBuf = torch.empty(
+                (n, 3, self.tileSize, self.tileSize), dtype=self.img_tensor.dtype, device=self.device
+            ).contiguous(memory_format=self.memoryFormat)
+        return self._tileBuf[:n]
+
+    def _estimate_batch_size(self) -> int:
+        """Pick how many tiles to run per forward pass from the tile size and free device memory."""
+        if not str(self.device).startswith("cuda"):
+            # CPU and MPS gain little from batching; keep memory use as before
+            return 1
+        try:
+            free_bytes, _ = torch.cuda.mem_get_info(torch.device(self.device))
+        except Exception:
+            return 1
+        tile_bytes = 3 * self.tileSize * self.tileSize * 4 * (1 + self.scale * self.scale)
+        per_tile = tile_bytes * ACTIVATION_FACTOR
+        return max(1, min(MAX_TILE_BATCH, int(free_bytes * BATCH_MEMORY_FRACTION // per_tile)))
+
     def img2tensor(self, img):
+        """Upload img at its native integer width and convert to a normalized float tensor on the device.
+
+        Transfers 1-2 bytes per channel instead of 4, and the HWC permute leaves the result channels-last.
+        """
+        tensor = torch.from_numpy(np.ascontiguousarray(img)).to(self.device)
+        # Out of place: for a float image on the CPU, float() and the upload return a view of img itself, which
+        # may be shared through read_image's cache
         if self.dtype == np.uint16:
-            tensor = torch.from_numpy(img).float() / 65535.0
+            tensor = tensor.float().div(65535.0)
         else:
-            tensor = torch.from_numpy(img).float() / 255.0
-        tensor = tensor.permute(2, 0, 1).unsqueeze(0)
-        return tensor
+            tensor = tensor.float().div(255.0)
+        return tensor.permute(2, 0, 1).unsqueeze(0)
 
     def tensor2img(self, tensor):
-        img = tensor.cpu().detach().squeeze(0).permute(1, 2, 0).numpy()
+        """Scale, clip and cast on the device, then download the result at its final integer width."""
+        tensor = tensor.detach()
         if self.dtype == np.uint16:
-            img = (img * 65535.0).clip(0, 65535).astype(self.dtype)
+            tensor = tensor.mul(65535.0).clamp_(0, 65535).to(torch.uint16)
         elif self.dtype == np.uint8:
-            img = (img * 255.0).clip(0, 255).astype(self.dtype)
-        return img
+            tensor = tensor.mul(255.0).clamp_(0, 255).to(torch.uint8)
+        # Already contiguous when the tensor is channels-last; cv2 needs a contiguous array either way
+        return np.ascontiguousarray(tensor.cpu().squeeze(0).permute(1, 2, 0).numpy())
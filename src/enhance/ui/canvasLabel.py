@@ -1,3 +1,4 @@
+import math
 from typing import Optional
 import cv2
 import numpy as np
@@ -6,6 +7,7 @@ from PySide6.QtGui import (QPainter, QPaintEvent, QWheelEvent, QMouseEvent,
                            QPixmap, QColor, QPen, QFont, QImage)
 from PySide6.QtWidgets import QLabel, QWidget
 
+from enhance.lib.file import wait_for_write
 from enhance.ui.selectionManager import SelectionManager
 from enhance.ui.signals import Signals, getSignals
 from enhance.ui.common import RenderMode, ZoomLevel
@@ -20,6 +22,19 @@ MASK_COLORS = [
     [255, 255, 0],  # Yellow
     [255, 165, 0]   # Orange
 ]
+# The same colors in OpenCV's channel order, for drawing on BGR images
+MASK_COLORS_BGR = [tuple(reversed(c)) for c in MASK_COLORS]
+
+# Zoomed images up to this many pixels are rendered whole and cached, so panning only re-crops them.
+# Larger renders (deep zoom on big images) resample just the visible region instead.
+MAX_CACHED_RENDER_PIXELS = 8_000_000
+
+
+def _selected_pixels(mask_img: np.ndarray) -> np.ndarray:
+    """Boolean map of the pixels a mask fully selects (value 1, or 255 once scaled to 8 bits)."""
+    if mask_img.dtype == np.bool_:
+        return mask_img
+    return (mask_img * 255).astype(np.uint8) == 255
 
 
 class CanvasLabel(QLabel):
@@ -50,6 +65,11 @@ class CanvasLabel(QLabel):
         self.fraction = 0.5
         self.renderMode: RenderMode = RenderMode.Single
         self.visibleMaskIndices: set = set()
+        # Zoomed full-size pixmap per displayed image: id(img) -> (width, height, pixmap). Panning only
+        # re-crops these; they are rebuilt when the zoom changes and dropped when images are reloaded.
+        self._scaledCache: dict = {}
+        # ((zoomFactor, height, width), (scaled width, scaled height)) for the base image
+        self._scaledSize = None
 
         self.setScaledContents(False)
         self.setStatusMessage()
@@ -64,39 +84,40 @@ class CanvasLabel(QLabel):
         if self.renderMode == RenderMode.Split:
             self.repaint()
 
+    def _readImage(self, path):
+        """Read path for display, or None if it can't be read (e.g. its background cache write failed)."""
+        try:
+            wait_for_write(path)
+        except Exception:
+            # already logged by the writer
+            return None
+        return cv2.imread(path)
+
+    def _readCompareImage(self, baseFile, idx):
+        compareFile = self.selectionManager.getCompareFile(idx)
+        img = self._readImage(compareFile.path) if compareFile is not None else None
+        if img is None:
+            return np.zeros((self.img1.shape[0], self.img1.shape[1], 3), np.uint8)
+        if self.visibleMaskIndices:
+            img = self.applyMasks(baseFile, img)
+        return img
+
     def showFiles(self, resetView=False):
         # We load files here with 8bits/channel for consistent display via QPixmap. This doesn't impact how we work with channels in models.
+        self._scaledCache.clear()
         baseFile = self.selectionManager.getBaseFile()
-        if baseFile is not None:
-            self.img1 = cv2.imread(baseFile.path)
+        img1 = self._readImage(baseFile.path) if baseFile is not None else None
+        if img1 is not None:
+            self.img1 = img1
             if self.visibleMaskIndices:
                 self.img1 = self.applyMasks(baseFile, self.img1)
 
             if self.renderMode == RenderMode.Split or self.renderMode == RenderMode.Grid:
-                compareFile = self.selectionManager.getCompareFile(0)
-                if compareFile is not None:
-                    self.img2 = cv2.imread(compareFile.path)
-                    if self.visibleMaskIndices:
-                        self.img2 = self.applyMasks(baseFile, self.img2)
-                else:
-                    self.img2 = np.zeros((self.img1.shape[0], self.img1.shape[1], 3), np.uint8)
+                self.img2 = self._readCompareImage(baseFile, 0)
 
             if self.renderMode == RenderMode.Grid:
-                compareFile2 = self.selectionManager.getCompareFile(1)
-                if compareFile2 is not None:
-                    self.img3 = cv2.imread(compareFile2.path)
-                    if self.visibleMaskIndices:
-                        self.img3 = self.applyMasks(baseFile, self.img3)
-                else:
-                    self.img3 = np.zeros((self.img1.shape[0], self.img1.shape[1], 3), np.uint8)
-
-                compareFile3 = self.selectionManager.getCompareFile(2)
-                if compareFile3 is not None:
-                    self.img4 = cv2.imread(compareFile3.path)
-                    if self.visibleMaskIndices:
-                        self.img4 = self.applyMasks(baseFile, self.img4)
-                else:
-                    self.img4 = np.zeros((self.img1.shape[0], self.img1.shape[1], 3), np.uint8)
+                self.img3 = self._readCompareImage(baseFile, 1)
+                self.img4 = self._readCompareImage(baseFile, 2)
 
         else:
             self.img1 = np.zeros((0, 0, 3), np.uint8)
@@ -109,23 +130,29 @@ class CanvasLabel(QLabel):
 
     def applyMasks(self, file, img):
         if len(file.masks) > 0:
+            # Sum the tint colors of all visible masks, then blend them into the image in a single pass
+            overlay = None
+            labels = []
             for idx, mask in enumerate(file.masks):
                 if idx not in self.visibleMaskIndices:
                     continue
-                # If there are masks, we can use the first one to set the size of the image
+                color = MASK_COLORS_BGR[idx % len(MASK_COLORS_BGR)]
+                labels.append((mask, color))
+                mask_img = mask.mask
+                if mask_img is not None and len(mask_img.shape) == 2:
+                    if overlay is None:
+                        overlay = np.zeros(img.shape, dtype=np.float32)
+                    overlay[_selected_pixels(mask_img)] += color
+            if overlay is not None:
+                # Same as adding each mask with cv2.addWeighted(img, 1.0, color_mask, 0.33, 0) in turn
+                img = cv2.convertScaleAbs(cv2.scaleAdd(overlay, 0.33, img.astype(np.float32)))
+
+            for mask, color in labels:
                 box = mask.box
-                color = MASK_COLORS[idx % len(MASK_COLORS)].copy()
-                color.reverse()
                 img = cv2.rectangle(img, (int(box[0]), int(
                     box[1])), (int(box[2]), int(box[3])), color, 2)
                 img = cv2.putText(img, mask.uniqueLabel,
                                   (int(box[0]), int(box[1]) - 10), cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 255, 255), 2)
-                mask_img = mask.mask
-                if mask_img is not None and len(mask_img.shape) == 2:
-                    mask_img = np.array(mask_img * 255).astype(np.uint8)
-                    color_mask_img = np.zeros((mask_img.shape[0], mask_img.shape[1], 3), dtype=np.uint8)
-                    color_mask_img[mask_img == 255] = color
-                    img = cv2.addWeighted(img, 1.0, color_mask_img, 0.33, 0)
         return img
 
     def setStatusMessage(self) -> None:
@@ -285,31 +312,39 @@ class CanvasLabel(QLabel):
         elif self.renderMode == RenderMode.Grid:
             self.paintGrid()
 
+    def getScaledSize(self):
+        """Return (width, height) of the base image at the current zoom, recomputed only when either changes."""
+        key = (self.zoomFactor, self.img1.shape[0], self.img1.shape[1])
+        if self._scaledSize is None or self._scaledSize[0] != key:
+            self._scaledSize = (key, (int(key[2] * self.zoomFactor), int(key[1] * self.zoomFactor)))
+        return self._scaledSize[1]
+
     def maybeClampImage(self, scale=1):
         # Recenter image if it fits within viewport
         # Clamp image if position is out of bounds
-        h = int(self.img1.shape[0] * self.zoomFactor)
-        w = int(self.img1.shape[1] * self.zoomFactor)
+        w, h = self.getScaledSize()
+        viewWidth = self.width()
+        viewHeight = self.height()
 
-        shouldRecenterX = w <= self.width() // scale
+        shouldRecenterX = w <= viewWidth // scale
         if shouldRecenterX:
             self.posX = int(
-                (self.width() / scale - self.img1.shape[1] * self.zoomFactor) / 2)
+                (viewWidth / scale - self.img1.shape[1] * self.zoomFactor) / 2)
         else:
             if self.posX > 0:
                 self.posX = 0
-            elif int(self.width() / scale) - self.posX > w:
-                self.posX = int(self.width() / scale) - w
+            elif int(viewWidth / scale) - self.posX > w:
+                self.posX = int(viewWidth / scale) - w
 
-        shouldRecenterY = h <= self.height() // scale
+        shouldRecenterY = h <= viewHeight // scale
         if shouldRecenterY:
             self.posY = int(
-                (self.height() / scale - self.img1.shape[0] * self.zoomFactor) / 2)
+                (viewHeight / scale - self.img1.shape[0] * self.zoomFactor) / 2)
         else:
             if self.posY > 0:
                 self.posY = 0
-            elif int(self.height() / scale) - self.posY > h:
-                self.posY = int(self.height() / scale) - h
+            elif int(viewHeight / scale) - self.posY > h:
+                self.posY = int(viewHeight / scale) - h
 
     def paintSingle(self):
         pixmapWidth = self.width()
@@ -382,23 +417,60 @@ class CanvasLabel(QLabel):
 
         painter.end()
 
-    def makeScaledPixmap(self, img, x, y, w, h, fname, scale=1):
-        # Make a pixmap for a quadrant
-        if img is None or w <= 0 or h <= 0:
-            return QPixmap(w, h)
-
+    def getScaledPixmap(self, img, scale=1) -> QPixmap:
         renderWidth = int(img.shape[1] * self.zoomFactor / scale)
         renderHeight = int(img.shape[0] * self.zoomFactor / scale)
 
+        cached = self._scaledCache.get(id(img))
+        if cached is not None and cached[0] == renderWidth and cached[1] == renderHeight:
+            return cached[2]
+
         interpolation = cv2.INTER_AREA if self.zoomFactor < 1 else cv2.INTER_CUBIC
         scaledImg = cv2.resize(img, (renderWidth, renderHeight), interpolation=interpolation)
 
         pixmap = QPixmap.fromImage(QImage(scaledImg.data, scaledImg.shape[1], scaledImg.shape[0],
                                           scaledImg.shape[1] * 3, QImage.Format_BGR888))
+        self._scaledCache[id(img)] = (renderWidth, renderHeight, pixmap)
+        return pixmap
+
+    def getScaledCrop(self, img, cx, cy, w, h, scale=1) -> QPixmap:
+        """Render only the region (cx, cy, w, h) of the zoomed image, resampling just the source pixels it covers."""
+        factor = self.zoomFactor / scale
+        # A couple of extra source pixels on each side keep cubic interpolation correct at the crop edges
+        margin = 2
+        sx1 = max(math.floor(cx / factor) - margin, 0)
+        sy1 = max(math.floor(cy / factor) - margin, 0)
+        sx2 = min(math.ceil((cx + w) / factor) + margin, img.shape[1])
+        sy2 = min(math.ceil((cy + h) / factor) + margin, img.shape[0])
+        if sx2 <= sx1 or sy2 <= sy1:
+            return QPixmap(w, h)
+
+        interpolation = cv2.INTER_AREA if self.zoomFactor < 1 else cv2.INTER_CUBIC
+        scaledImg = cv2.resize(
+            img[sy1:sy2, sx1:sx2],
+            (round((sx2 - sx1) * factor), round((sy2 - sy1) * factor)),
+            interpolation=interpolation,
+        )
+        ox = round(cx - sx1 * factor)
+        oy = round(cy - sy1 * factor)
+        scaledImg = np.ascontiguousarray(scaledImg[oy:oy + h, ox:ox + w])
+        return QPixmap.fromImage(QImage(scaledImg.data, scaledImg.shape[1], scaledImg.shape[0],
+                                        scaledImg.shape[1] * 3, QImage.Format_BGR888))
+
+    def makeScaledPixmap(self, img, x, y, w, h, fname, scale=1):
+        # Make a pixmap for a quadrant
+        if img is None or w <= 0 or h <= 0:
+            return QPixmap(w, h)
+
         # crop
         cx = -x if x < 0 else 0
         cy = -y if y < 0 else 0
-        pixmap = pixmap.copy(cx, cy, w, h)
+        renderWidth = int(img.shape[1] * self.zoomFactor / scale)
+        renderHeight = int(img.shape[0] * self.zoomFactor / scale)
+        if renderWidth * renderHeight <= MAX_CACHED_RENDER_PIXELS:
+            pixmap = self.getScaledPixmap(img, scale).copy(cx, cy, w, h)
+        else:
+            pixmap = self.getScaledCrop(img, int(cx), int(cy), w, h, scale)
 
         # labels
         painter = QPainter(pixmap)
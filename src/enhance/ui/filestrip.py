@@ -1,24 +1,42 @@
 from enum import Enum
+import functools
 from functools import partial
+import os
 import time
 from typing import Dict, List
-from PySide6.QtWidgets import QMenu, QPushButton, QLabel, QVBoxLayout, QFrame, QScrollArea, QSizePolicy, QApplication, QMessageBox
-from PySide6.QtGui import QPixmap, QColor, QIcon, QPaintEvent, QPainter, QPalette, QFontMetrics, QFont, QMouseEvent
-from PySide6.QtCore import QObject, Qt, QSize, QPoint, Signal, QTimer
-from PIL import Image
-from PIL.ImageQt import ImageQt
+from PySide6.QtWidgets import (QMenu, QPushButton, QLabel, QWidget, QVBoxLayout, QFrame, QScrollArea, QSizePolicy,
+                               QMessageBox)
+from PySide6.QtGui import (QPixmap, QColor, QIcon, QImage, QImageReader, QPaintEvent, QPixmapCache, QPainter, QPalette,
+                           QFontMetrics, QFont, QMouseEvent)
+from PySide6.QtCore import QObject, Qt, QSize, QPoint, Signal, QThreadPool, QTimer
 
 from enhance.app import App
-from enhance.lib.file import File, InputFile, OutputFile
+from enhance.lib.file import File, InputFile, OutputFile, wait_for_write
 from enhance.ui.selectionManager import SelectionManager
-from enhance.ui.signals import Signals, emitLater, getSignals
+from enhance.ui.signals import AsyncWorker, Signals, getSignals
 
 FILESTRIP_CONTAINER_HEIGHT = 150
 FILESTRIP_SCROLL_HEIGHT = 146
 FILE_BUTTON_SIZE = 120
 FILE_IMAGE_SIZE = 108
+INDICATOR_SIZE = 20
 
-DOUBLE_CLICK_INTERVAL = 200
+LABEL_CACHE_SIZE = 4096
+SCROLL_UPDATE_INTERVAL = 50
+
+# Selection highlight for FileButtons, switched by their indState property
+FILE_BUTTON_STYLE = (
+    'FileButton[indState="primary"] { background-color: blue; }'
+    ' FileButton[indState="secondary"] { background-color: dimgray; }'
+)
+
+# QPixmapCache limit in KiB; a 108x108 ARGB thumbnail is ~46 KiB, so this holds ~1400 thumbnails
+THUMBNAIL_CACHE_KB = 64 * 1024
+
+THUMBNAIL_VISIBLE_PRIORITY = 1
+THUMBNAIL_PRELOAD_PRIORITY = 0
+
+thumbnail_threadpool = QThreadPool()
 
 
 class Indicator(Enum):
@@ -35,19 +53,25 @@ class FileStrip:
         self.buttons: Dict[File, FileButton] = {}
         self.frameBaseFile = frameBaseFile
         self.frameFileList = frameFileList
+        # buttons created for each frame, so redraws and scroll checks needn't walk the widget tree
+        self.frameButtons: Dict[QFrame, List[FileButton]] = {frameBaseFile: [], frameFileList: []}
         self.frameContainer = frameContainer
         self.signals = getSignals()
         self.app = app
         self.maxVisibleButtons = maxVisibleButtons
         self.selectionManager = selectionManager
         self.addButton: QPushButton = None  # The "+" button for creating new output files
+        QPixmapCache.setCacheLimit(THUMBNAIL_CACHE_KB)
 
         self.scroll = self.frameContainer.findChildren(QScrollArea)[0]
-        self.scroll.horizontalScrollBar().valueChanged.connect(
-            partial(self.updateThumbnails, self.frameFileList)
-        )
-        self.signals.updateThumbnail.connect(self.updateThumbnail)
-
+        # coalesce scroll ticks into at most one visibility pass per interval
+        self.scrollTimer = QTimer(self.frameContainer)
+        self.scrollTimer.setSingleShot(True)
+        self.scrollTimer.setInterval(SCROLL_UPDATE_INTERVAL)
+        self.scrollTimer.timeout.connect(partial(self.updateThumbnails, self.frameFileList))
+        self.scroll.horizontalScrollBar().valueChanged.connect(self.scheduleThumbnailUpdate)
+
+        self.frameContainer.setStyleSheet(FILE_BUTTON_STYLE)
         self.frameContainer.setMinimumSize(QSize(FILE_BUTTON_SIZE+8, FILESTRIP_CONTAINER_HEIGHT))
         self.frameContainer.setMaximumSize(QSize(16777215, FILESTRIP_CONTAINER_HEIGHT))
         self.scroll.setMinimumSize(QSize(FILE_BUTTON_SIZE+8, FILESTRIP_SCROLL_HEIGHT))
@@ -56,22 +80,26 @@ class FileStrip:
 
         self.signals.focusFile.connect(self.focusFile)
         self.signals.updateIndicator.connect(self.updateIndicator)
-        self.signals.addFileButton.connect(self.addFileButton)
         self.signals.appendFile.connect(self.appendFile)
         redrawSignal.connect(self.drawFileList)
 
+        self.removePlaceholders(self.frameBaseFile)
+        self.removePlaceholders(self.frameFileList)
         self.drawFileList()
 
     def removeButton(self, file: File):
-        button = self.buttons.pop(file)
+        button = self.buttons.pop(file, None)
+        if button is None:
+            return
+        for buttons in self.frameButtons.values():
+            if button in buttons:
+                buttons.remove(button)
         button.deleteLater()
 
-    def makeFileButton(self, frame, file, doFocus, doPriority):
+    def makeFileButton(self, file):
         button = FileButton(self.signals, file)
         self.buttons[file] = button
-
-        priority = 10 if doPriority else 0
-        emitLater(self.signals.addFileButton.emit, frame, button, doFocus, priority=priority)
+        return button
 
     def makeAddButton(self):
         """Create the '+' button for adding new output files"""
@@ -89,24 +117,30 @@ class FileStrip:
         self.addButton.clicked.connect(lambda: self.signals.createOutputFile.emit())
         return self.addButton
 
-    def cleanFrame(self, frame):
-        for child in frame.findChildren(QLabel):
-            child.setParent(None)
-            child.deleteLater()
-        for child in frame.findChildren(QPushButton):
-            # Preserve the add button; it will be repositioned by ensureAddButtonAtEnd
-            if child == self.addButton:
-                continue
-            child.setParent(None)
-            child.deleteLater()
-        for child in frame.findChildren(QFrame):
+    def removePlaceholders(self, frame):
+        """Remove the placeholder widgets the designer file puts in the frame."""
+        for child in frame.findChildren(QWidget, "", Qt.FindDirectChildrenOnly):
             child.setParent(None)
             child.deleteLater()
 
+    def discardButton(self, button):
+        if self.buttons.get(button.file) is button:
+            del self.buttons[button.file]
+        button.setParent(None)
+        button.deleteLater()
+
+    def cleanFrame(self, frame):
+        # The add button isn't tracked here; it is preserved and repositioned by ensureAddButtonAtEnd
+        for button in self.frameButtons[frame]:
+            self.discardButton(button)
+        self.frameButtons[frame] = []
+
     def appendFile(self, file: File):
         fileList = self.app.getFileList()
         self.fileCountLabel.setText(f"({len(fileList)})")
-        self.makeFileButton(self.frameFileList, file, True, True)
+        button = self.makeFileButton(file)
+        self.frameButtons[self.frameFileList].append(button)
+        self.addFileButton(self.frameFileList, button)
         # Re-add the "+" button at the end
         self.ensureAddButtonAtEnd()
 
@@ -118,6 +152,9 @@ class FileStrip:
             return
         addBtn = self.makeAddButton()
         layout = self.frameFileList.layout()
+        if layout.count() > 0 and layout.itemAt(layout.count() - 1).widget() is addBtn:
+            addBtn.setVisible(True)
+            return
         # Remove from current position if already in the layout
         layout.removeWidget(addBtn)
         # Re-add at the end
@@ -125,32 +162,65 @@ class FileStrip:
         addBtn.setVisible(True)
 
     def drawFileList(self, focusOnFile: File = None):
-        self.cleanFrame(self.frameBaseFile)
-        if self.app.getBaseFile() is not None:
-            self.makeFileButton(self.frameBaseFile, self.app.getBaseFile(), True, True)
+        baseFile = self.app.getBaseFile()
+        wantedBase = [] if baseFile is None else [baseFile]
+        if [button.file for button in self.frameButtons[self.frameBaseFile]] != wantedBase:
+            self.cleanFrame(self.frameBaseFile)
+            for file in wantedBase:
+                button = self.makeFileButton(file)
+                self.frameButtons[self.frameBaseFile].append(button)
+                self.addFileButton(self.frameBaseFile, button)
+        else:
+            for button in self.frameButtons[self.frameBaseFile]:
+                button.refreshIfChanged()
 
-        self.cleanFrame(self.frameFileList)
         fileList = self.app.getFileList()
         self.fileCountLabel.setText(f"({len(fileList)})")
 
-        for idx, file in enumerate(fileList):
-            doFocus = False
-            if focusOnFile is not None:
-                if file == focusOnFile:
-                    doFocus = True
+        # Diff against the existing buttons: keep those whose file is still listed (with their thumbnails
+        # and indicators), create the missing ones and discard the rest
+        frame = self.frameFileList
+        existing: Dict[File, FileButton] = {}
+        stale = []
+        for button in self.frameButtons[frame]:
+            if button.file in existing:
+                stale.append(button)
+            else:
+                existing[button.file] = button
+        buttons = []
+        for file in fileList:
+            button = existing.pop(file, None)
+            if button is None:
+                button = self.makeFileButton(file)
             else:
-                if idx == 0:
-                    doFocus = True
-            doPriority = idx < 10 if self.maxVisibleButtons < 0 else idx < self.maxVisibleButtons
-            if idx % 5 == 0:  # yield periodically to enable the frame to render with full width buttons
-                QApplication.processEvents()
-            self.makeFileButton(self.frameFileList, file, doFocus, doPriority)
+                button.refreshIfChanged()
+            self.buttons[file] = button
+            buttons.append(button)
+        stale.extend(existing.values())
+        self.frameButtons[frame] = buttons
+
+        # Apply the changes with updates off, then lay the frame out once
+        layout = frame.layout()
+        frame.setUpdatesEnabled(False)
+        for button in stale:
+            layout.removeWidget(button)
+            self.discardButton(button)
+        for idx, button in enumerate(buttons):
+            item = layout.itemAt(idx)
+            if item is None or item.widget() is not button:
+                layout.removeWidget(button)
+                layout.insertWidget(idx, button, 0, Qt.AlignTop)
 
         # Add the "+" button at the end
         self.ensureAddButtonAtEnd()
+        layout.invalidate()
+        layout.activate()
+        frame.updateGeometry()
+        frame.setUpdatesEnabled(True)
 
         if self.maxVisibleButtons > 0:
             self.fitMaxSize()
+        self.scheduleThumbnailUpdate()
 
     def fitMaxSize(self):
         c = len(self.app.getFileList())
@@ -163,7 +233,7 @@ class FileStrip:
             self.buttons[file].setFocus()
             self.scroll.ensureWidgetVisible(self.buttons[file])
 
-    def addFileButton(self, frame: QFrame, button: QPushButton, forceFocus=False):
+    def addFileButton(self, frame: QFrame, button: QPushButton):
         layout = frame.layout()
 
         # Insert before the "+" button if it exists in this frame
@@ -181,15 +251,39 @@ class FileStrip:
         layout.activate()
         frame.updateGeometry()
 
-    def updateThumbnails(self, frame, _=None):
-        if frame == self.frameFileList:
-            for child in frame.findChildren(FileButton):
-                if child.isVisible() and not child.renderedThumbnail and not child.visibleRegion().isEmpty():
-                    emitLater(self.signals.updateThumbnail.emit, frame, child)
+    def scheduleThumbnailUpdate(self, _=None):
+        # throttle rather than debounce so thumbnails keep appearing during a long scroll
+        if not self.scrollTimer.isActive():
+            self.scrollTimer.start()
 
-    def updateThumbnail(self, frame, button):
+    def updateThumbnails(self, frame, _=None):
         if frame == self.frameFileList:
-            button.showEvent(None)
+            buttons = self.frameButtons[frame]
+            first, last = self.visibleButtonRange()
+            # preload a page either side at lower priority so thumbnails are ready before they scroll in
+            page = last - first
+            for children, priority in (
+                (buttons[first:last], THUMBNAIL_VISIBLE_PRIORITY),
+                (buttons[max(0, first - page):first] + buttons[last:last + page], THUMBNAIL_PRELOAD_PRIORITY),
+            ):
+                for child in children:
+                    if child.isVisible() and not child.renderedThumbnail:
+                        child.renderThumbnail(priority)
+
+    def visibleButtonRange(self):
+        """Index range of list buttons inside the scroll viewport.
+
+        Buttons are fixed-size siblings in a horizontal layout, so this is arithmetic on the scroll offset
+        rather than a visibleRegion() query per button.
+        """
+        layout = self.frameFileList.layout()
+        stride = FILE_BUTTON_SIZE + layout.spacing()
+        origin = self.frameFileList.x() + layout.contentsMargins().left()
+        x0 = self.scroll.horizontalScrollBar().value() - origin
+        x1 = x0 + self.scroll.viewport().width()
+        first = max(0, x0 // stride)
+        last = min(len(self.frameButtons[self.frameFileList]), x1 // stride + 1)
+        return first, last
 
     def updateIndicator(self, file: File, idx: int):
         if file in self.buttons:
@@ -202,6 +296,79 @@ class FileStrip:
         return None
 
 
+@functools.lru_cache(maxsize=4)
+def placeholderPixmap(rgba: int) -> QPixmap:
+    pixmap = QPixmap(FILE_IMAGE_SIZE, FILE_IMAGE_SIZE)
+    pixmap.fill(QColor.fromRgba(rgba))
+    return pixmap
+
+
+@functools.lru_cache(maxsize=32)
+def indicatorBadge(rgba: int, label: str, dpr: float) -> QPixmap:
+    """Indicator circle and label rendered once, so repaints blit a pixmap instead of drawing shapes and text."""
+    color = QColor.fromRgba(rgba)
+    # one pixel wider than the circle for the outline pen
+    size = INDICATOR_SIZE + 1
+    badge = QPixmap(round(size * dpr), round(size * dpr))
+    badge.setDevicePixelRatio(dpr)
+    badge.fill(Qt.transparent)
+    painter = QPainter(badge)
+    painter.setBrush(color)
+    painter.setPen(color)
+    painter.drawEllipse(0, 0, INDICATOR_SIZE, INDICATOR_SIZE)
+    painter.setPen(QColor(255, 255, 255))
+    painter.drawText(0, 0, INDICATOR_SIZE, INDICATOR_SIZE, Qt.AlignCenter, label)
+    painter.end()
+    return badge
+
+
+class ThumbnailSignals(QObject):
+    loaded: Signal = Signal(str, QImage)
+
+
+def thumbnailKey(path: str) -> str:
+    st = os.stat(path)
+    return f"{path}:{st.st_mtime_ns}:{FILE_IMAGE_SIZE}"
+
+
+def loadThumbnail(path: str, thumbnailSignals: ThumbnailSignals) -> None:
+    """Decode and composite a thumbnail off the UI thread. QImage is safe to paint outside the GUI thread."""
+    try:
+        wait_for_write(path)
+        # keyed after the write has landed so a partially written file is never cached
+        key = thumbnailKey(path)
+        # Let the decoder scale while reading (JPEG decodes at reduced resolution) instead of loading full size
+        reader = QImageReader(path)
+        reader.setAutoTransform(True)
+        size = reader.size()
+        if size.width() > FILE_IMAGE_SIZE or size.height() > FILE_IMAGE_SIZE:
+            size.scale(FILE_IMAGE_SIZE, FILE_IMAGE_SIZE, Qt.KeepAspectRatio)
+            reader.setScaledSize(size)
+        image = reader.read()
+        if image.isNull():
+            return
+
+        thumbnail = QImage(FILE_IMAGE_SIZE, FILE_IMAGE_SIZE, QImage.Format_ARGB32_Premultiplied)
+        thumbnail.fill(QColor(128, 128, 128))
+        painter = QPainter(thumbnail)
+        offset_x = 0
+        offset_y = 0
+        if image.width() < FILE_IMAGE_SIZE:
+            offset_x = (FILE_IMAGE_SIZE - image.width()) // 2
+        if image.height() < FILE_IMAGE_SIZE:
+            offset_y = (FILE_IMAGE_SIZE - image.height()) // 2
+        painter.drawImage(offset_x, offset_y, image)
+        painter.end()
+    except Exception:
+        return
+
+    try:
+        thumbnailSignals.loaded.emit(key, thumbnail)
+    except RuntimeError:
+        # label was deleted while decoding
+        pass
+
+
 class IconLabel(QLabel):
     def __init__(self, file: File = None):
         super().__init__()
@@ -210,43 +377,56 @@ class IconLabel(QLabel):
         self.indicators: List[Indicator] = []
 
         self.setFixedSize(QSize(FILE_IMAGE_SIZE, FILE_IMAGE_SIZE))
-        if not self.file is None:
+        # child of the label so results for a deleted label are dropped rather than delivered
+        self.thumbnailSignals = ThumbnailSignals(self)
+        self.thumbnailSignals.loaded.connect(self.setThumbnail)
+        if not self.file is None and self._waitForFile(file.path):
             self.pixmap = QPixmap(file.path)
         else:
-            self.pixmap = QPixmap(FILE_IMAGE_SIZE, FILE_IMAGE_SIZE)
-            self.pixmap.fill(self.palette().color(QPalette.Window))
+            # QPixmap is implicitly shared and setThumbnail replaces rather than paints into it
+            self.pixmap = placeholderPixmap(self.palette().color(QPalette.Window).rgba())
         self.setAlignment(Qt.AlignCenter)
 
-    def setFile(self, file: File) -> None:
+    @staticmethod
+    def _waitForFile(path: str) -> bool:
+        try:
+            wait_for_write(path)
+        except Exception:
+            # the failed cache write was logged by the writer; show the placeholder instead
+            return False
+        return True
+
+    def setFile(self, file: File, priority: int = THUMBNAIL_VISIBLE_PRIORITY) -> None:
+        """Show a cached thumbnail, or decode it on the thumbnail pool and swap the pixmap in when it arrives."""
         self.file = file
+        pixmap = QPixmap()
         try:
-            image = Image.open(file.path)
-            image.thumbnail((FILE_IMAGE_SIZE, FILE_IMAGE_SIZE))
-            qt_image = ImageQt(image)
-            pixmap = QPixmap.fromImage(qt_image)
-
-            self.pixmap = QPixmap(FILE_IMAGE_SIZE, FILE_IMAGE_SIZE)
-            self.pixmap.fill(QColor(128, 128, 128))
-            painter = QPainter(self.pixmap)
-            offset_x = 0
-            offset_y = 0
-            if pixmap.width() < FILE_IMAGE_SIZE:
-                offset_x = (FILE_IMAGE_SIZE - pixmap.width()) / 2
-            if pixmap.height() < FILE_IMAGE_SIZE:
-                offset_y = (FILE_IMAGE_SIZE - pixmap.height()) / 2
-            painter.drawPixmap(offset_x, offset_y, pixmap)
-            painter.end()
-        except:
-            pass
+            found = QPixmapCache.find(thumbnailKey(file.path), pixmap)
+        except OSError:
+            # not written yet; the worker waits for it
+            found = False
+        if found:
+            self.pixmap = pixmap
+            self.update()
+            return
+        worker = AsyncWorker(partial(loadThumbnail, file.path, self.thumbnailSignals))
+        thumbnail_threadpool.start(worker, priority=priority)
+
+    def setThumbnail(self, key: str, image: QImage) -> None:
+        try:
+            current = thumbnailKey(self.file.path)
+        except OSError:
+            current = None
+        if key != current:
+            # decoded for a file, or a version of it, that this label has since moved on from
+            return
+        self.pixmap = QPixmap.fromImage(image)
+        QPixmapCache.insert(key, self.pixmap)
+        self.update()
 
     def drawIndicator(self, painter: QPainter, color: QColor, label: str, offset: int):
-        painter.setBrush(color)
-        painter.setPen(color)
-        painter.drawEllipse(FILE_IMAGE_SIZE - 25, 5 + offset, 20, 20)
-        painter.setPen(QColor(255, 255, 255))
-        painter.drawText(
-            FILE_IMAGE_SIZE - 25, 5 + offset, 20, 20, Qt.AlignCenter, label
-        )
+        badge = indicatorBadge(color.rgba(), label, self.devicePixelRatioF())
+        painter.drawPixmap(FILE_IMAGE_SIZE - 25, 5 + offset, badge)
         offset += 28
         return offset
 
@@ -269,26 +449,40 @@ class IconLabel(QLabel):
             offset = self.drawIndicator(painter, QColor(0, 128, 0), "S", offset)
 
 
+# Fonts and metrics need a QGuiApplication, so these are built on first use rather than at import
+@functools.lru_cache(maxsize=1)
+def labelFont() -> QFont:
+    return QFont("Arial", 9)
+
+
+@functools.lru_cache(maxsize=1)
+def labelMetrics() -> QFontMetrics:
+    return QFontMetrics(labelFont())
+
+
+@functools.lru_cache(maxsize=LABEL_CACHE_SIZE)
+def elideLabel(text: str) -> str:
+    return labelMetrics().elidedText(text, Qt.TextElideMode.ElideMiddle, FILE_IMAGE_SIZE)
+
+
 class FileButton(QPushButton):
     def __init__(self, signals: Signals, file: File):
         super().__init__()
         self.file = file
         self.signals = signals
         self.renderedThumbnail = False
+        # path and name the thumbnail and label were drawn for
+        self.shownPath = file.path
+        self.shownBasename = file.basename
         self.draw()
 
     def draw(self):
         self.iconLabel = IconLabel()
         self.objectName = self.file.basename
-        placeHolder = QPixmap(FILE_IMAGE_SIZE, FILE_IMAGE_SIZE)
-        placeHolder.fill(QColor(0, 0, 0, 0))
 
-        self.textLabel = QLabel(self.file.basename)
+        self.textLabel = QLabel(elideLabel(self.file.basename))
         self.textLabel.setAlignment(Qt.AlignCenter)
-        self.textLabel.setFont(QFont("Arial", 9))
-        metrics = QFontMetrics(self.textLabel.font())
-        clippedText = metrics.elidedText(self.file.basename, Qt.TextElideMode.ElideMiddle, FILE_IMAGE_SIZE)
-        self.textLabel.setText(clippedText)
+        self.textLabel.setFont(labelFont())
 
         layout = QVBoxLayout(self)
         self.setSizePolicy(QSizePolicy(QSizePolicy.Fixed, QSizePolicy.Fixed))
@@ -298,36 +492,27 @@ class FileButton(QPushButton):
         layout.addWidget(self.iconLabel)
         layout.addWidget(self.textLabel)
 
-        # timer to distinguish double / single clicks
-        self.timer = QTimer(self)
-        self.timer.setSingleShot(True)
-        self.timer.timeout.connect(lambda: self.delayedMousePressEvent(self.click_pending_event))
-        self.click_pending = False
-        self.click_pending_event = None
+        self.doubleClicked = False
 
     def updateTextLabel(self):
-        metrics = QFontMetrics(self.textLabel.font())
-        clippedText = metrics.elidedText(self.file.basename, Qt.TextElideMode.ElideMiddle, FILE_IMAGE_SIZE)
-        self.textLabel.setText(clippedText)
+        self.textLabel.setText(elideLabel(self.file.basename))
+        self.shownBasename = self.file.basename
+
+    def refreshIfChanged(self):
+        """Redraw the label and drop the thumbnail if the file moved or was renamed since they were drawn."""
+        if self.file.path != self.shownPath:
+            self.shownPath = self.file.path
+            self.iconLabel.pixmap = placeholderPixmap(self.iconLabel.palette().color(QPalette.Window).rgba())
+            self.iconLabel.update()
+            if self.renderedThumbnail:
+                self.renderThumbnail()
+        if self.file.basename != self.shownBasename:
+            self.updateTextLabel()
 
     def focusOutEvent(self, arg__1):
         return super().focusOutEvent(arg__1)
 
     def mousePressEvent(self, e: QMouseEvent):
-        self.click_pending = True
-        self.click_pending_event = e.clone()
-        self.timer.start(DOUBLE_CLICK_INTERVAL)
-
-    def delayedMousePressEvent(self, e):
-        if e.button() == Qt.LeftButton:
-            self.signals.selectCompareFile.emit(self.file)
-
-            if e.modifiers() == Qt.ShiftModifier:
-                self.signals.selectBaseFile.emit(self.file, False)
-
-        if self.click_pending:
-            self.click_pending = False
-
         if e.button() == Qt.RightButton:
             if isinstance(self.file, OutputFile):
                 menu = QMenu(self)
@@ -340,19 +525,32 @@ class FileButton(QPushButton):
         else:
             return super().mousePressEvent(e)
 
+    def mouseReleaseEvent(self, e: QMouseEvent):
+        super().mouseReleaseEvent(e)
+        # the release that ends a double click was already handled by mouseDoubleClickEvent
+        if self.doubleClicked:
+            self.doubleClicked = False
+            return
+        if e.button() == Qt.LeftButton:
+            # Acts at once rather than waiting out the double-click interval, so the first click of a double
+            # click also selects the compare file before mouseDoubleClickEvent selects the base file
+            self.signals.selectCompareFile.emit(self.file)
+
+            if e.modifiers() == Qt.ShiftModifier:
+                self.signals.selectBaseFile.emit(self.file, False)
+
     def mouseDoubleClickEvent(self, e: QMouseEvent) -> None:
-        if self.click_pending:
-            self.timer.stop()
-            self.click_pending = False
-            self.delayedMouseDoubleClickEvent()
+        if e.button() == Qt.LeftButton:
+            self.doubleClicked = True
+            self.signals.selectBaseFile.emit(self.file, False)
 
-    def delayedMouseDoubleClickEvent(self):
-        self.signals.selectBaseFile.emit(self.file, False)
+    def renderThumbnail(self, priority: int = THUMBNAIL_VISIBLE_PRIORITY):
+        self.iconLabel.setFile(self.file, priority)
+        self.renderedThumbnail = True
 
     def maybeDeferredRenderThumbnail(self, forceFocus=False):
         if self.isVisible() and not self.renderedThumbnail and not self.iconLabel.visibleRegion().isEmpty():
-            self.iconLabel.setFile(self.file)
-            self.renderedThumbnail = True
+            self.renderThumbnail()
 
             # focus first instance in list once it is available
             if forceFocus:
@@ -380,11 +578,16 @@ class FileButton(QPushButton):
             self.iconLabel.indicators.append(Indicator.SAVED)
 
         if idx == 0:
-            self.setStyleSheet("background-color: blue;")
+            state = "primary"
         elif idx > 0:
-            self.setStyleSheet("background-color: dimgray;")
+            state = "secondary"
         else:
-            self.setStyleSheet("")
+            state = ""
+        # the colours come from the strip's stylesheet; re-polish only when the state actually changes
+        if self.property("indState") != state:
+            self.setProperty("indState", state)
+            self.style().unpolish(self)
+            self.style().polish(self)
 
         self.repaint()
 
@@ -12,12 +12,34 @@ from PySide6.QtWidgets import (
     QFrame,
     QVBoxLayout,
 )
-from PySide6.QtCore import Signal, Qt, QPoint
+from PySide6.QtCore import Signal, Qt, QPoint, QSignalBlocker
 
 import copy
+from functools import partial
 from typing import List
 from enhance.lib.file import Mask
 
+# Inside/outside mode label colours, switched by the label's modeState property
+MODE_LABEL_STYLE = """
+    ClickableLabel {
+        color: #888;
+        padding: 2px 6px;
+        border: 1px solid #555;
+        border-radius: 3px;
+        background-color: #3a3a3a;
+    }
+    ClickableLabel[modeState="insideOn"] {
+        color: #fff;
+        border: 1px solid #5a9f5a;
+        background-color: #4a8f4a;
+    }
+    ClickableLabel[modeState="outsideOn"] {
+        color: #fff;
+        border: 1px solid #5a7fb5;
+        background-color: #4a6fa5;
+    }
+"""
+
 
 class ClickableLabel(QLabel):
     """A QLabel that emits a signal when clicked."""
@@ -37,6 +59,9 @@ class MaskItemWidget(QWidget):
         super().__init__(parent)
         self.mask = mask
         self._inverted = False
+        # (selected, inverted) as of the last change, and the state before it
+        self.state = (False, False)
+        self.previous_state = self.state
         self.setupUi()
 
     def setupUi(self):
@@ -58,7 +83,7 @@ class MaskItemWidget(QWidget):
         self.modeLabel.setAlignment(Qt.AlignCenter)
         self.modeLabel.setCursor(Qt.PointingHandCursor)
         self.modeLabel.clicked.connect(self._toggle_mode)
-        self._apply_inside_style()
+        self._apply_mode_style()
         layout.addWidget(self.modeLabel)
 
     def _toggle_mode(self):
@@ -76,57 +101,20 @@ class MaskItemWidget(QWidget):
 
     def _apply_mode_style(self):
         if self._inverted:
-            self._apply_outside_style()
-        else:
-            self._apply_inside_style()
-
-    def _apply_inside_style(self):
-        self.modeLabel.setText("inside")
-        if self.checkbox.isChecked():
-            self.modeLabel.setStyleSheet("""
-                QLabel {
-                    color: #fff;
-                    padding: 2px 6px;
-                    border: 1px solid #5a9f5a;
-                    border-radius: 3px;
-                    background-color: #4a8f4a;
-                }
-            """)
+            text = "outside"
         else:
-            self.modeLabel.setStyleSheet("""
-                QLabel {
-                    color: #888;
-                    padding: 2px 6px;
-                    border: 1px solid #555;
-                    border-radius: 3px;
-                    background-color: #3a3a3a;
-                }
-            """)
-
-    def _apply_outside_style(self):
-        self.modeLabel.setText("outside")
-        if self.checkbox.isChecked():
-            self.modeLabel.setStyleSheet("""
-                QLabel {
-                    color: #fff;
-                    padding: 2px 6px;
-                    border: 1px solid #5a7fb5;
-                    border-radius: 3px;
-                    background-color: #4a6fa5;
-                }
-            """)
-        else:
-            self.modeLabel.setStyleSheet("""
-                QLabel {
-                    color: #888;
-                    padding: 2px 6px;
-                    border: 1px solid #555;
-                    border-radius: 3px;
-                    background-color: #3a3a3a;
-                }
-            """)
+            text = "inside"
+        state = text + ("On" if self.checkbox.isChecked() else "Off")
+        self.modeLabel.setText(text)
+        # the colours come from the popup's stylesheet; re-polish only when the state actually changes
+        if self.modeLabel.property("modeState") != state:
+            self.modeLabel.setProperty("modeState", state)
+            self.modeLabel.style().unpolish(self.modeLabel)
+            self.modeLabel.style().polish(self.modeLabel)
 
     def _on_changed(self):
+        self.previous_state = self.state
+        self.state = (self.checkbox.isChecked(), self._inverted)
         self.changed.emit()
 
     def is_selected(self) -> bool:
@@ -135,6 +123,7 @@ class MaskItemWidget(QWidget):
     def set_selected(self, selected: bool):
         self.checkbox.setChecked(selected)
         self._apply_mode_style()
+        self.state = (selected, self._inverted)
 
     def is_inverted(self) -> bool:
         return self._inverted
@@ -142,6 +131,7 @@ class MaskItemWidget(QWidget):
     def set_inverted(self, inverted: bool):
         self._inverted = inverted
         self._apply_mode_style()
+        self.state = (self.checkbox.isChecked(), inverted)
 
 
 class MaskPopupFrame(QFrame):
@@ -160,61 +150,79 @@ class MaskPopupFrame(QFrame):
                 border: 1px solid #555;
                 border-radius: 4px;
             }
-        """)
+        """ + MODE_LABEL_STYLE)
 
         self.layout = QVBoxLayout(self)
         self.layout.setContentsMargins(4, 4, 4, 4)
         self.layout.setSpacing(2)
 
         self.mask_widgets: List[MaskItemWidget] = []
-        self._initialSelection = []
+        self._dirty = False
+        self._initialSelection = None
 
     def showEvent(self, event):
-        """Remember selection state when popup opens."""
+        """Start tracking selection changes when popup opens."""
         super().showEvent(event)
-        self._initialSelection = self._get_selection_key()
+        self._dirty = False
+        self._initialSelection = None
 
     def hideEvent(self, event):
         """Emit signal when popup closes if selection changed."""
         super().hideEvent(event)
-        current_selection = self._get_selection_key()
-        if current_selection != self._initialSelection:
+        # edits that end where they started (tick then untick) are not a change
+        if self._dirty and self._get_selection_key() != self._initialSelection:
             self.selectionChanged.emit(self.get_selection())
         self.closed.emit()
 
-    def _get_selection_key(self) -> tuple:
-        """Get a hashable key representing the current selection state."""
+    def _on_item_changed(self, changed_widget: MaskItemWidget):
+        if not self._dirty:
+            # first edit of this session: record the selection as it was just before it
+            self._initialSelection = self._get_selection_key(changed_widget)
+        self._dirty = True
+
+    def _get_selection_key(self, changed_widget: MaskItemWidget = None) -> tuple:
+        """Get a hashable key for the selection state, with changed_widget rolled back one change."""
         return tuple(
-            (w.mask.uniqueLabel, w.is_selected(), w.is_inverted())
+            (w.mask.uniqueLabel,) + (w.previous_state if w is changed_widget else w.state)
             for w in self.mask_widgets
         )
 
     def set_masks(self, masks: List[Mask], selected_masks: List[Mask] = None):
-        """Set the available masks."""
-        # Clear existing widgets
+        """Set the available masks, reusing the widgets of masks that are still present."""
+        existing = {}
         for widget in self.mask_widgets:
-            widget.deleteLater()
-        self.mask_widgets.clear()
-
-        # Clear layout
-        while self.layout.count():
-            item = self.layout.takeAt(0)
-            if item.widget():
-                item.widget().deleteLater()
+            existing.setdefault(widget.mask.uniqueLabel, widget)
 
         # Build a dict of selected mask labels to their inverted state
         selected_mask_info = {m.uniqueLabel: m.inverted for m in (selected_masks or [])}
 
+        widgets = []
         for mask in masks:
-            item_widget = MaskItemWidget(mask)
+            item_widget = existing.pop(mask.uniqueLabel, None)
+            if item_widget is None:
+                item_widget = MaskItemWidget(mask)
+                item_widget.changed.connect(partial(self._on_item_changed, item_widget))
+            else:
+                item_widget.mask = mask
 
-            # Pre-select if in selected_masks and set inverted state
-            if mask.uniqueLabel in selected_mask_info:
-                item_widget.set_selected(True)
-                item_widget.set_inverted(selected_mask_info[mask.uniqueLabel])
+            # Pre-select if in selected_masks and set inverted state; this is not a user change,
+            # so keep the checkbox from emitting stateChanged for every mask
+            with QSignalBlocker(item_widget.checkbox):
+                item_widget.set_selected(mask.uniqueLabel in selected_mask_info)
+                item_widget.set_inverted(selected_mask_info.get(mask.uniqueLabel, False))
+            widgets.append(item_widget)
 
-            self.layout.addWidget(item_widget)
-            self.mask_widgets.append(item_widget)
+        # Remove widgets for masks that are gone, then put the rest in mask order
+        for widget in self.mask_widgets:
+            if widget not in widgets:
+                self.layout.removeWidget(widget)
+                widget.deleteLater()
+        for idx, widget in enumerate(widgets):
+            item = self.layout.itemAt(idx)
+            if item is None or item.widget() is not widget:
+                self.layout.removeWidget(widget)
+                self.layout.insertWidget(idx, widget)
+        self.mask_widgets = widgets
 
         self.adjustSize()
 
@@ -243,6 +251,8 @@ class MaskSelectorButton(QToolButton):
         super().__init__(parent)
         self.masks: List[Mask] = []
         self.popup: MaskPopupFrame = None
+        # Selection to apply once the popup is first built
+        self._pending_selection: List[Mask] = []
 
         self.setText("Masks: None")
         self.setStyleSheet("""
@@ -262,10 +272,17 @@ class MaskSelectorButton(QToolButton):
         self.clicked.connect(self._show_popup)
 
     def _show_popup(self):
-        """Show the popup with mask options."""
-        if not self.popup or not self.masks:
+        """Show the popup with mask options, building it on first use."""
+        if not self.masks:
             return
 
+        if self.popup is None:
+            self.popup = MaskPopupFrame()
+            self.popup.selectionChanged.connect(self._on_popup_selection_changed)
+            self.popup.closed.connect(self._update_button_text)
+            self.popup.set_masks(self.masks, self._pending_selection)
+            self._pending_selection = []
+
         # Position popup below the button
         pos = self.mapToGlobal(QPoint(0, self.height()))
         self.popup.move(pos)
@@ -284,13 +301,11 @@ class MaskSelectorButton(QToolButton):
 
         self.setEnabled(True)
 
-        # Create popup if needed
+        # The popup and its item widgets are only built once the button is clicked
         if self.popup is None:
-            self.popup = MaskPopupFrame()
-            self.popup.selectionChanged.connect(self._on_popup_selection_changed)
-            self.popup.closed.connect(self._update_button_text)
-
-        self.popup.set_masks(masks, selected_masks)
+            self._pending_selection = list(selected_masks or [])
+        else:
+            self.popup.set_masks(masks, selected_masks)
         self._update_button_text()
 
     def _on_popup_selection_changed(self, selected_masks: list):
@@ -299,30 +314,37 @@ class MaskSelectorButton(QToolButton):
 
     def _update_button_text(self):
         """Update the button text to reflect current selection."""
-        if not self.popup:
-            return
-
-        selected = [w for w in self.popup.mask_widgets if w.is_selected()]
+        selected = self.get_selection()
 
         if not selected:
             self.setText("Masks: None")
         elif len(selected) == 1:
-            mode = "outside" if selected[0].is_inverted() else "inside"
-            self.setText(f"Mask: {selected[0].mask.uniqueLabel} ({mode})")
+            mode = "outside" if selected[0].inverted else "inside"
+            self.setText(f"Mask: {selected[0].uniqueLabel} ({mode})")
         else:
             # Check if all have same mode
-            modes = set(w.is_inverted() for w in selected)
+            modes = set(m.inverted for m in selected)
             if len(modes) == 1:
-                mode = "outside" if selected[0].is_inverted() else "inside"
+                mode = "outside" if selected[0].inverted else "inside"
                 self.setText(f"Masks: {len(selected)} selected ({mode})")
             else:
                 self.setText(f"Masks: {len(selected)} selected (mixed)")
 
     def get_selection(self) -> List[Mask]:
         """Get the current selection."""
+        if not self.masks:
+            return []
         if self.popup:
             return self.popup.get_selection()
-        return []
+
+        selected_mask_info = {m.uniqueLabel: m.inverted for m in self._pending_selection}
+        selected_masks = []
+        for mask in self.masks:
+            if mask.uniqueLabel in selected_mask_info:
+                mask_copy = copy.copy(mask)
+                mask_copy.inverted = selected_mask_info[mask.uniqueLabel]
+                selected_masks.append(mask_copy)
+        return selected_masks
 
     def set_selection(self, selected_masks: List[Mask]):
         """Set the current selection programmatically."""
@@ -336,5 +358,7 @@ class MaskSelectorButton(QToolButton):
                     widget.set_inverted(selected_mask_info[widget.mask.uniqueLabel])
                 else:
                     widget.set_selected(False)
+        else:
+            self._pending_selection = list(selected_masks)
 
-            self._update_button_text()
+        self._update_button_text()
@@ -1,7 +1,6 @@
 from PySide6.QtWidgets import (
     QFrame,
-    QVBoxLayout,
-    QHBoxLayout,
+    QGridLayout,
     QLabel,
     QSlider,
 )
@@ -12,6 +11,18 @@ from enhance.lib.file import AppliedOperation, Mask
 from enhance.ui.mask_selector import MaskSelectorButton
 from typing import List
 
+OPERATION_FRAME_STYLE = """
+    OperationWidget {
+        border: 1px solid rgb(92, 92, 92);
+        border-radius: 4px;
+        margin: 2px;
+        padding: 4px;
+    }
+"""
+NAME_LABEL_STYLE = "font-weight: bold; color: #fff;"
+TITLE_LABEL_STYLE = "color: #aaa;"
+DIM_LABEL_STYLE = "color: #9a9996;"
+
 
 class OperationWidget(QFrame):
     """A widget that displays a single operation with its controls."""
@@ -19,41 +30,53 @@ class OperationWidget(QFrame):
     strengthChanged = Signal(AppliedOperation, float)
     masksChanged = Signal(AppliedOperation, list)
 
+    # Sliders and mask selectors released by discarded widgets, reused by the next ones built
+    _slider_pool: List[QSlider] = []
+    _mask_selector_pool: List[MaskSelectorButton] = []
+
     def __init__(self, operation: AppliedOperation, available_masks: List[Mask] = None, parent=None):
         super().__init__(parent)
         self.operation = operation
         self.available_masks = available_masks if available_masks else []
+        self._masks_sig = tuple(id(m) for m in self.available_masks)
+        self.strength_slider: QSlider = None
         self.mask_selector: MaskSelectorButton = None
+        self._display_name: str = None
+        self._controls_built = False
+        self._last_strength: int = None
         self.setupUi()
 
     def setupUi(self):
         self.setFrameShape(QFrame.NoFrame)
-        self.setStyleSheet("""
-            OperationWidget {
-                border: 1px solid rgb(92, 92, 92);
-                border-radius: 4px;
-                margin: 2px;
-                padding: 4px;
-            }
-        """)
-
-        layout = QVBoxLayout(self)
-        layout.setContentsMargins(6, 6, 6, 6)
-        layout.setSpacing(4)
+        self.setStyleSheet(OPERATION_FRAME_STYLE)
+
+        # One grid for the whole widget: titles in column 0, values in column 1,
+        # full-width rows span both columns
+        self.layout = QGridLayout(self)
+        self.layout.setContentsMargins(6, 6, 6, 6)
+        self.layout.setHorizontalSpacing(4)
+        self.layout.setVerticalSpacing(4)
+        self.layout.setColumnStretch(1, 1)
+        self._build_header()
+
+    def showEvent(self, event):
+        """Build the strength, scale and mask controls the first time the widget is shown."""
+        if not self._controls_built:
+            self._build_controls()
+        super().showEvent(event)
+
+    def _build_header(self):
+        layout = self.layout
+        row = 0
 
         # Operation name header
         name_label = QLabel(self._get_operation_display_name())
-        name_label.setStyleSheet("font-weight: bold; color: #fff;")
-        layout.addWidget(name_label)
+        name_label.setStyleSheet(NAME_LABEL_STYLE)
+        layout.addWidget(name_label, row, 0, 1, 2)
+        row += 1
 
         # Model name (if applicable)
         if self.operation.model:
-            model_frame = QFrame()
-            model_frame.setFrameShape(QFrame.NoFrame)
-            model_layout = QHBoxLayout(model_frame)
-            model_layout.setContentsMargins(0, 0, 0, 0)
-            model_layout.setSpacing(4)
-
             model_label = QLabel()
             metrics = QFontMetrics(model_label.font())
             elided = metrics.elidedText(
@@ -61,103 +84,99 @@ class OperationWidget(QFrame):
             )
             model_label.setText(elided)
             model_label.setToolTip(self.operation.model)
-            model_label.setStyleSheet("color: #9a9996;")
-            model_layout.addWidget(model_label)
-            model_layout.addStretch()
+            model_label.setStyleSheet(DIM_LABEL_STYLE)
+            layout.addWidget(model_label, row, 0, 1, 2, Qt.AlignLeft)
+            row += 1
 
-            layout.addWidget(model_frame)
+    def _build_controls(self):
+        self._controls_built = True
+        layout = self.layout
+        row = layout.rowCount()
 
         # Strength slider (if applicable)
         if self.operation.supportsStrength():
-            strength_frame = QFrame()
-            strength_frame.setFrameShape(QFrame.NoFrame)
-            strength_layout = QVBoxLayout(strength_frame)
-            strength_layout.setContentsMargins(0, 4, 0, 0)
-            strength_layout.setSpacing(2)
-
-            strength_header_layout = QHBoxLayout()
-            strength_header_layout.setContentsMargins(0, 0, 0, 0)
-
             strength_title_label = QLabel("Strength:")
-            strength_title_label.setStyleSheet("color: #aaa;")
-            strength_header_layout.addWidget(strength_title_label)
+            strength_title_label.setStyleSheet(TITLE_LABEL_STYLE)
+            layout.addWidget(strength_title_label, row, 0)
 
             strength_pct = int((self.operation.strength if self.operation.strength is not None else 1.0) * 100)
             self.strength_value_label = QLabel(f"{strength_pct}%")
-            self.strength_value_label.setStyleSheet("color: #aaa;")
+            self.strength_value_label.setStyleSheet(TITLE_LABEL_STYLE)
             self.strength_value_label.setMinimumWidth(35)
-            strength_header_layout.addWidget(self.strength_value_label)
-            strength_header_layout.addStretch()
-
-            strength_layout.addLayout(strength_header_layout)
-
-            slider_frame = QFrame()
-            slider_frame.setFrameShape(QFrame.NoFrame)
-            slider_layout = QHBoxLayout(slider_frame)
-            slider_layout.setContentsMargins(0, 0, 0, 0)
-
-            self.strength_slider = QSlider(Qt.Horizontal)
-            self.strength_slider.setMinimum(0)
-            self.strength_slider.setMaximum(100)
+            layout.addWidget(self.strength_value_label, row, 1, Qt.AlignLeft)
+            row += 1
+
+            if self._slider_pool:
+                self.strength_slider = self._slider_pool.pop()
+            else:
+                self.strength_slider = QSlider(Qt.Horizontal)
+                self.strength_slider.setMinimum(0)
+                self.strength_slider.setMaximum(100)
+                self.strength_slider.setTickPosition(QSlider.TicksBothSides)
+                self.strength_slider.setTickInterval(10)
             self.strength_slider.setValue(strength_pct)
-            self.strength_slider.setTickPosition(QSlider.TicksBothSides)
-            self.strength_slider.setTickInterval(10)
+            self._last_strength = strength_pct
             self.strength_slider.valueChanged.connect(self._on_strength_changed)
-            slider_layout.addWidget(self.strength_slider)
-
-            strength_layout.addWidget(slider_frame)
-            layout.addWidget(strength_frame)
+            layout.addWidget(self.strength_slider, row, 0, 1, 2)
+            row += 1
 
         # Scale display (if applicable)
         if self.operation.scale is not None and self.operation.scale < 1.0:
-            scale_frame = QFrame()
-            scale_frame.setFrameShape(QFrame.NoFrame)
-            scale_layout = QHBoxLayout(scale_frame)
-            scale_layout.setContentsMargins(0, 4, 0, 0)
-            scale_layout.setSpacing(4)
-
             scale_title_label = QLabel("Downscale:")
-            scale_title_label.setStyleSheet("color: #aaa;")
-            scale_layout.addWidget(scale_title_label)
+            scale_title_label.setStyleSheet(TITLE_LABEL_STYLE)
+            layout.addWidget(scale_title_label, row, 0)
 
             scale_value = f"{int(1 / self.operation.scale)}X"
             scale_value_label = QLabel(scale_value)
-            scale_value_label.setStyleSheet("color: #9a9996;")
-            scale_layout.addWidget(scale_value_label)
-            scale_layout.addStretch()
-
-            layout.addWidget(scale_frame)
+            scale_value_label.setStyleSheet(DIM_LABEL_STYLE)
+            layout.addWidget(scale_value_label, row, 1, Qt.AlignLeft)
+            row += 1
 
         # Mask selector button (always show, even if no masks yet)
-        self._create_mask_selector(layout)
+        self._create_mask_selector(layout, row)
 
-    def _create_mask_selector(self, layout: QVBoxLayout):
+    def _create_mask_selector(self, layout: QGridLayout, row: int):
         """Create the mask selector button."""
-        masks_frame = QFrame()
-        masks_frame.setFrameShape(QFrame.NoFrame)
-        masks_layout = QHBoxLayout(masks_frame)
-        masks_layout.setContentsMargins(0, 4, 0, 0)
-        masks_layout.setSpacing(4)
-
-        self.mask_selector = MaskSelectorButton()
+        if self._mask_selector_pool:
+            self.mask_selector = self._mask_selector_pool.pop()
+        else:
+            self.mask_selector = MaskSelectorButton()
         self.mask_selector.set_masks(
             self.available_masks, selected_masks=self.operation.masks
         )
         self.mask_selector.selectionChanged.connect(self._on_mask_selection_changed)
-        masks_layout.addWidget(self.mask_selector)
-        masks_layout.addStretch()
-
-        layout.addWidget(masks_frame)
-        self.masks_frame = masks_frame
+        layout.addWidget(self.mask_selector, row, 0, 1, 2, Qt.AlignLeft)
+
+    def release_controls(self):
+        """Hand the slider and mask selector back to the pools before this widget is deleted."""
+        if self.strength_slider is not None:
+            self.strength_slider.valueChanged.disconnect(self._on_strength_changed)
+            self.layout.removeWidget(self.strength_slider)
+            self.strength_slider.setParent(None)
+            self._slider_pool.append(self.strength_slider)
+            self.strength_slider = None
+
+        if self.mask_selector is not None:
+            self.mask_selector.selectionChanged.disconnect(self._on_mask_selection_changed)
+            self.layout.removeWidget(self.mask_selector)
+            self.mask_selector.setParent(None)
+            self._mask_selector_pool.append(self.mask_selector)
+            self.mask_selector = None
 
     def _get_operation_display_name(self) -> str:
         """Get a human-readable name for the operation."""
-        if self.operation.operation_type:
-            return self.operation.operation_type.value
-        return "Unknown"
+        if self._display_name is None:
+            if self.operation.operation_type:
+                self._display_name = self.operation.operation_type.value
+            else:
+                self._display_name = "Unknown"
+        return self._display_name
 
     def _on_strength_changed(self, value: int):
         """Handle strength slider value changes."""
+        if value == self._last_strength:
+            return
+        self._last_strength = value
         strength = value / 100.0
         self.strength_value_label.setText(f"{value}%")
         self.strengthChanged.emit(self.operation, strength)
@@ -168,24 +187,24 @@ class OperationWidget(QFrame):
 
     def get_strength(self) -> float:
         """Get the current strength value."""
-        if hasattr(self, 'strength_slider'):
+        if self.strength_slider is not None:
             return self.strength_slider.value() / 100.0
-        return self.operation.strength or 1.0
+        return self.operation.strength if self.operation.strength is not None else 1.0
 
     def get_selected_masks(self) -> List[Mask]:
         """Get the currently selected masks."""
         if self.mask_selector:
             return self.mask_selector.get_selection()
-        return []
+        return list(self.operation.masks or [])
 
     def update_available_masks(self, new_masks: List[Mask]):
         """Update the available masks in the mask selector."""
-        new_keys = [m.uniqueLabel for m in new_masks]
-        old_keys = [m.uniqueLabel for m in self.available_masks]
-        if new_keys == old_keys:
+        new_sig = tuple(id(m) for m in new_masks)
+        if new_sig == self._masks_sig:
             return
 
         self.available_masks = new_masks
+        self._masks_sig = new_sig
 
         if self.mask_selector:
             self.mask_selector.set_masks(new_masks, selected_masks=self.operation.masks)
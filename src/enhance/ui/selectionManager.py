@@ -1,4 +1,5 @@
-from typing import List
+from collections import OrderedDict
+from itertools import islice
 from enhance.lib.file import File
 from enhance.ui.signals import Signals, emitLater
 from enhance.ui.common import RenderMode
@@ -13,7 +14,8 @@ class SelectionManager:
         self.renderMode: RenderMode = RenderMode.Single
 
         self.base: File = None
-        self.compare: List[File] = []
+        # compare files, most recent first, mapped to the indicator last emitted for them (None if not yet emitted)
+        self.compare: OrderedDict[File, int] = OrderedDict()
 
         self.signals.selectCompareFile.connect(self.selectCompare)
         self.signals.selectBaseFile.connect(self.selectBase)
@@ -25,8 +27,7 @@ class SelectionManager:
 
         if file == self.base:
             return
-        if file in self.compare:
-            self.compare.remove(file)
+        self.compare.pop(file, None)
         if self.base is not None:
             self.signals.updateIndicator.emit(self.base, CLEAR)
 
@@ -41,14 +42,13 @@ class SelectionManager:
     def selectCompare(self, file):
         if file == self.base:
             return
-        if file in self.compare:
-            self.compare.remove(file)
-            self.signals.updateIndicator.emit(file, CLEAR)
-
-        self.compare.insert(0, file)
+        # a file that is already selected keeps its last indicator; updateIndicators moves it if needed
+        self.compare[file] = self.compare.pop(file, None)
+        self.compare.move_to_end(file, last=False)
         if len(self.compare) > 4:
-            rmFile = self.compare.pop()
-            self.signals.updateIndicator.emit(rmFile, CLEAR)
+            rmFile, rmIdx = self.compare.popitem()
+            if rmIdx != CLEAR:
+                self.signals.updateIndicator.emit(rmFile, CLEAR)
 
         emitLater(self.signals.showFiles.emit, False)
 
@@ -62,8 +62,8 @@ class SelectionManager:
             self.base = None
             self.signals.updateIndicator.emit(file, CLEAR)
         elif file in self.compare:
-            self.compare.remove(file)
-            self.signals.updateIndicator.emit(file, CLEAR)
+            if self.compare.pop(file) != CLEAR:
+                self.signals.updateIndicator.emit(file, CLEAR)
 
         emitLater(self.signals.showFiles.emit, True)
 
@@ -72,8 +72,9 @@ class SelectionManager:
             self.signals.updateIndicator.emit(self.base, CLEAR)
             self.base = None
 
-        for file in self.compare:
-            self.signals.updateIndicator.emit(file, CLEAR)
+        for file, idx in self.compare.items():
+            if idx != CLEAR:
+                self.signals.updateIndicator.emit(file, CLEAR)
         self.compare.clear()
 
         emitLater(self.signals.showFiles.emit, True)
@@ -89,20 +90,24 @@ class SelectionManager:
     def getCompareFile(self, idx) -> File:
         if idx >= len(self.compare):
             return None
-        return self.compare[idx]
+        return next(islice(self.compare, idx, None))
 
     def getCompareFilename(self, idx) -> str:
         if idx >= len(self.compare):
             return ""
-        return self.compare[idx].basename
+        return next(islice(self.compare, idx, None)).basename
 
     def setRenderMode(self, mode: RenderMode):
         self.renderMode = mode
         self.updateIndicators()
 
     def updateIndicators(self):
-        for idx, f in enumerate(self.compare):
+        # only emit for files whose indicator actually changes
+        for idx, (f, lastIdx) in enumerate(list(self.compare.items())):
             if idx == 0 or self.renderMode == RenderMode.Grid:
-                self.signals.updateIndicator.emit(f, idx + 1)
+                newIdx = idx + 1
             else:
-                self.signals.updateIndicator.emit(f, CLEAR)
+                newIdx = CLEAR
+            if newIdx != lastIdx:
+                self.compare[f] = newIdx
+                self.signals.updateIndicator.emit(f, newIdx)
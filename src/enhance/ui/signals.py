@@ -1,14 +1,19 @@
+from collections import deque
 from functools import partial
+import os
 import time
-from PySide6.QtCore import QObject, Signal, QThreadPool, QEvent
-from PySide6.QtWidgets import QWidget, QPushButton, QFrame
+from PySide6.QtCore import QObject, Signal, QEvent, QTimer
+from PySide6.QtWidgets import QPushButton
 from PySide6.QtCore import QThread, QRunnable
 
 from enhance.lib.file import File
 from enhance.ui.common import RenderMode
 
 
-WorkerHistory = []
+# Labelled worker statuses shown in the task queue dialog; only the most recent are kept
+WORKER_HISTORY_SIZE = 2048
+WORKER_HISTORY = os.environ.get("ENHANCE_WORKER_HISTORY", "1") == "1"
+WorkerHistory = deque(maxlen=WORKER_HISTORY_SIZE)
 
 
 class WorkerStatus:
@@ -19,7 +24,7 @@ class WorkerStatus:
         self.status = status
         self.scheduleTime = scheduleTime
         self.latency = latency
-        if self.label is not None:
+        if self.label is not None and WORKER_HISTORY:
             WorkerHistory.append(self)
 
 
@@ -64,9 +69,7 @@ class Signals(QObject):
     updateIndicator: Signal = Signal(File, int)
     updateGPUStats: Signal = Signal()
 
-    addFileButton: Signal = Signal(QWidget, QPushButton, bool)
     focusFile: Signal = Signal(File)
-    updateThumbnail: Signal = Signal(QFrame, QWidget)
     drawFileList: Signal = Signal(File)
     appendFile: Signal = Signal(File)
     createOutputFile: Signal = Signal()
@@ -84,14 +87,9 @@ class Signals(QObject):
     updateOperationWidgetMasks: Signal = Signal()  # Signal to update masks on operation widgets
 
 
-lowpri_threadpool = QThreadPool()
-lowpri_threadpool.setMaxThreadCount(1)
-
-
-def emitLater(emit, *args, priority=0):
-    worker = AsyncWorker(partial(emit, *args))
-    pool = lowpri_threadpool
-    pool.start(worker, priority=priority)
+def emitLater(emit, *args):
+    # queued onto the GUI event loop; a zero timeout with a context object is thread-safe
+    QTimer.singleShot(0, signals, partial(emit, *args))
 
 
 signals = Signals()
@@ -17,8 +17,8 @@ from PySide6.QtGui import (QBrush, QColor, QConicalGradient, QCursor,
     QPalette, QPixmap, QRadialGradient, QTransform)
 from PySide6.QtWidgets import (QAbstractButton, QApplication, QComboBox, QDialog,
     QDialogButtonBox, QFrame, QHBoxLayout, QHeaderView,
-    QLabel, QPushButton, QSizePolicy, QTableWidget,
-    QTableWidgetItem, QVBoxLayout, QWidget)
+    QLabel, QPushButton, QSizePolicy, QTableView,
+    QVBoxLayout, QWidget)
 import icons_rc
 
 class Ui_Dialog(object):
@@ -123,21 +123,15 @@ class Ui_Dialog(object):
 
         self.verticalLayout.addWidget(self.frame_3)
 
-        self.tableWidget = QTableWidget(self.frame)
-        if (self.tableWidget.columnCount() < 6):
-            self.tableWidget.setColumnCount(6)
-        if (self.tableWidget.rowCount() < 20):
-            self.tableWidget.setRowCount(20)
-        self.tableWidget.setObjectName(u"tableWidget")
-        self.tableWidget.setShowGrid(True)
-        self.tableWidget.setCornerButtonEnabled(True)
-        self.tableWidget.setRowCount(20)
-        self.tableWidget.setColumnCount(6)
-        self.tableWidget.horizontalHeader().setProperty("showSortIndicator", True)
-        self.tableWidget.verticalHeader().setVisible(False)
-        self.tableWidget.verticalHeader().setProperty("showSortIndicator", False)
-
-        self.verticalLayout.addWidget(self.tableWidget)
+        self.tableView = QTableView(self.frame)
+        self.tableView.setObjectName(u"tableView")
+        self.tableView.setShowGrid(True)
+        self.tableView.setCornerButtonEnabled(True)
+        self.tableView.horizontalHeader().setProperty("showSortIndicator", True)
+        self.tableView.verticalHeader().setVisible(False)
+        self.tableView.verticalHeader().setProperty("showSortIndicator", False)
+
+        self.verticalLayout.addWidget(self.tableView)
 
         self.frame_2 = QFrame(self.frame)
         self.frame_2.setObjectName(u"frame_2")
@@ -1,10 +1,129 @@
-from PySide6.QtWidgets import QDialog, QTableWidgetItem, QPushButton, QAbstractItemView
+from PySide6.QtWidgets import (
+    QDialog,
+    QAbstractItemView,
+    QApplication,
+    QStyle,
+    QStyledItemDelegate,
+    QStyleOptionButton,
+)
 
 from enhance.app import App
 from enhance.ui.ui_dialog_model_manager import Ui_Dialog
 
-from PySide6.QtCore import Qt
+from PySide6.QtCore import (
+    Qt,
+    QAbstractTableModel,
+    QModelIndex,
+    QEvent,
+    QSortFilterProxyModel,
+    Signal,
+)
 import json
+from typing import Dict, List, Optional, Set, Tuple
+
+MODEL_LIST_HEADERS = ["Operation", "Name", "Subject", "", "Author", "Description"]
+INSTALL_COLUMN = 3
+# Model path of a row that can still be installed, None once it is installed
+INSTALL_PATH_ROLE = Qt.UserRole
+
+
+class ModelListTableModel(QAbstractTableModel):
+    """Table model over (path, model) pairs from the model catalog."""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.rows: List[Tuple[str, dict]] = []
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self.rows)
+
+    def columnCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(MODEL_LIST_HEADERS)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if orientation == Qt.Horizontal and role == Qt.DisplayRole:
+            return MODEL_LIST_HEADERS[section]
+        return None
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+
+        path, model = self.rows[index.row()]
+        column = index.column()
+
+        if role == Qt.DisplayRole:
+            if column == 0:
+                if isinstance(model.get("operation"), list):
+                    return ", ".join(model["operation"])
+            elif column == 1:
+                return model["name"]
+            elif column == 2:
+                if model.get("subject"):
+                    return ", ".join(model["subject"])
+            elif column == INSTALL_COLUMN:
+                return "Installed" if model.get("installed") else "Install"
+            elif column == 4:
+                return model["author"]
+            elif column == 5:
+                return model["description"]
+        elif role == Qt.TextAlignmentRole:
+            if column == INSTALL_COLUMN:
+                return Qt.AlignCenter
+        elif role == INSTALL_PATH_ROLE:
+            if column == INSTALL_COLUMN and not model.get("installed"):
+                return path
+
+        return None
+
+
+class ModelFilterProxyModel(QSortFilterProxyModel):
+    """Shows only the source rows in acceptedRows, or every row when it is None."""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.acceptedRows: Set[int] = None
+
+    def setAcceptedRows(self, rows: Optional[Set[int]]):
+        self.acceptedRows = rows
+        self.invalidateFilter()
+
+    def filterAcceptsRow(self, sourceRow, sourceParent):
+        return self.acceptedRows is None or sourceRow in self.acceptedRows
+
+
+class InstallButtonDelegate(QStyledItemDelegate):
+    """Paints an Install button for models that are not installed yet, without a widget per row."""
+
+    installClicked = Signal(str)
+
+    def paint(self, painter, option, index):
+        if index.data(INSTALL_PATH_ROLE) is None:
+            super().paint(painter, option, index)
+            return
+
+        button = QStyleOptionButton()
+        button.rect = option.rect.adjusted(2, 2, -2, -2)
+        button.text = index.data(Qt.DisplayRole)
+        button.state = QStyle.State_Enabled | QStyle.State_Raised
+        style = option.widget.style() if option.widget else QApplication.style()
+        style.drawControl(QStyle.CE_PushButton, button, painter, option.widget)
+
+    def editorEvent(self, event, model, option, index):
+        path = index.data(INSTALL_PATH_ROLE)
+        if (
+            path is not None
+            and event.type() == QEvent.MouseButtonRelease
+            and event.button() == Qt.LeftButton
+            and option.rect.contains(event.position().toPoint())
+        ):
+            self.installClicked.emit(path)
+            return True
+        return super().editorEvent(event, model, option, index)
 
 
 class DialogModelManager(QDialog):
@@ -18,31 +137,39 @@ class UI_DialogModelManager(Ui_Dialog):
     def __init__(self, app: App):
         super().__init__()
         self.app = app
+        # primary operation / subject -> source rows, rebuilt with the table model
+        self._byOperation: Dict[str, List[int]] = {}
+        self._bySubject: Dict[str, List[int]] = {}
 
     def setupUi(self, dialog: QDialog):
         super().setupUi(dialog)
 
         self.frame_nomodels.hide()
-        self.tableWidget.setSelectionBehavior(QAbstractItemView.SelectRows)
-        self.tableWidget.setColumnCount(6)
-        self.tableWidget.setHorizontalHeaderLabels(
-            ["Operation", "Name", "Subject", "", "Author", "Description"]
-        )
-        self.tableWidget.horizontalHeader().setDefaultAlignment(Qt.AlignLeft)
-        self.tableWidget.horizontalHeader().setStretchLastSection(True)
+        self.model = ModelListTableModel(dialog)
+        self.proxy = ModelFilterProxyModel(dialog)
+        self.proxy.setSourceModel(self.model)
+        self.tableView.setModel(self.proxy)
+        self.installDelegate = InstallButtonDelegate(self.tableView)
+        self.installDelegate.installClicked.connect(self.doInstall, Qt.UniqueConnection)
+        self.tableView.setItemDelegateForColumn(INSTALL_COLUMN, self.installDelegate)
+        self.tableView.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.tableView.horizontalHeader().setDefaultAlignment(Qt.AlignLeft)
+        self.tableView.horizontalHeader().setStretchLastSection(True)
 
         self.comboBox_filterOperation.currentTextChanged.connect(
-            self.setSelectOperation
+            self.setSelectOperation, Qt.UniqueConnection
         )
-        self.comboBox_filterSubject.currentTextChanged.connect(self.setSelectSubject)
-        self.pushButton_refresh.clicked.connect(self.doRefresh)
+        self.comboBox_filterSubject.currentTextChanged.connect(
+            self.setSelectSubject, Qt.UniqueConnection
+        )
+        self.pushButton_refresh.clicked.connect(self.doRefresh, Qt.UniqueConnection)
 
-        self.tableWidget.setColumnWidth(0, 100)
-        self.tableWidget.setColumnWidth(1, 300)
-        self.tableWidget.setColumnWidth(2, 100)
-        self.tableWidget.setColumnWidth(3, 100)
-        self.tableWidget.setColumnWidth(4, 100)
-        self.tableWidget.setColumnWidth(5, 300)
+        self.tableView.setColumnWidth(0, 100)
+        self.tableView.setColumnWidth(1, 300)
+        self.tableView.setColumnWidth(2, 100)
+        self.tableView.setColumnWidth(3, 100)
+        self.tableView.setColumnWidth(4, 100)
+        self.tableView.setColumnWidth(5, 300)
 
         self.selectedOperation = "All"
         self.selectedSubject = "All"
@@ -54,14 +181,16 @@ class UI_DialogModelManager(Ui_Dialog):
         subjects = set()
 
         modelList = self.app.getModels()
-        self.tableWidget.setRowCount(0)
         if len(modelList) == 0:
             self.frame_nomodels.show()
         else:
             self.frame_nomodels.hide()
 
+        # Swap the whole catalog into the table model at once; the proxy applies the filters
+        rows = []
+        byOperation = {}
+        bySubject = {}
         for modelName in modelList:
-            row = self.tableWidget.rowCount()
             model = modelList[modelName]
 
             operation = None
@@ -82,38 +211,17 @@ class UI_DialogModelManager(Ui_Dialog):
                 subject = model["subject"][0]
                 subjects.add(subject)
 
-            if self.selectedOperation != "All" and operation != self.selectedOperation:
-                continue
-
-            if self.selectedSubject != "All" and subject != self.selectedSubject:
-                continue
+            byOperation.setdefault(operation, []).append(len(rows))
+            bySubject.setdefault(subject, []).append(len(rows))
+            rows.append((modelName, model))
 
-            self.tableWidget.insertRow(row)
-            if operation is not None:
-                self.tableWidget.setItem(
-                    row, 0, QTableWidgetItem(", ".join(model["operation"]))
-                )
-
-            self.tableWidget.setItem(row, 1, QTableWidgetItem(model["name"]))
-
-            if "subject" in model:
-                self.tableWidget.setItem(
-                    row, 2, QTableWidgetItem(", ".join(model["subject"]))
-                )
-
-            if model.get("installed"):
-                item = QTableWidgetItem("Installed")
-                item.setTextAlignment(Qt.AlignCenter)
-                self.tableWidget.setItem(row, 3, item)
-            else:
-                installButton = QPushButton("Install")
-                installButton.clicked.connect(
-                    lambda checked, path=modelName: self.doInstall(path)
-                )
-                self.tableWidget.setCellWidget(row, 3, installButton)
-
-            self.tableWidget.setItem(row, 4, QTableWidgetItem(model["author"]))
-            self.tableWidget.setItem(row, 5, QTableWidgetItem(model["description"]))
+        self.model.beginResetModel()
+        self.model.rows = rows
+        self._byOperation = byOperation
+        self._bySubject = bySubject
+        # swap the filter in with the rows so the proxy never sees old row numbers against new rows
+        self.proxy.acceptedRows = self._acceptedRows()
+        self.model.endResetModel()
 
         # Populate the filter combo boxes once
         if init:
@@ -126,14 +234,28 @@ class UI_DialogModelManager(Ui_Dialog):
             self.comboBox_filterSubject.addItem("All")
             self.comboBox_filterSubject.addItems(sorted(subjects))
             self.selectedSubject = "All"
+            self._applyFilters()
+
+    def _acceptedRows(self) -> Optional[Set[int]]:
+        """Intersect the index entries of the selected operation and subject; None accepts every row."""
+        accepted = None
+        if self.selectedOperation != "All":
+            accepted = set(self._byOperation.get(self.selectedOperation, ()))
+        if self.selectedSubject != "All":
+            subjectRows = set(self._bySubject.get(self.selectedSubject, ()))
+            accepted = subjectRows if accepted is None else accepted & subjectRows
+        return accepted
+
+    def _applyFilters(self):
+        self.proxy.setAcceptedRows(self._acceptedRows())
 
     def setSelectOperation(self, operation: str):
         self.selectedOperation = operation
-        self.drawModelList()
+        self._applyFilters()
 
     def setSelectSubject(self, subject: str):
         self.selectedSubject = subject
-        self.drawModelList()
+        self._applyFilters()
 
     def doInstall(self, path: str):
         self.app.fetchModel(path)
@@ -20,7 +20,8 @@ class UI_DialogModel(Ui_Dialog):
     def __init__(self, app: App, filterOperations: List[Operation]):
         super().__init__()
         self.app = app
-        self.filterOperations = [op.value.lower() for op in filterOperations]
+        # de-duplicated, in the order given
+        self.filterOperations = list(dict.fromkeys(op.value.lower() for op in filterOperations))
         self.maskSelector: MaskSelectorButton = None
 
     def setupUi(self, dialog: QDialog):
@@ -29,7 +30,9 @@ class UI_DialogModel(Ui_Dialog):
         self.frame_nomodels.hide()
         self.listWidget.setSelectionMode(QListWidget.ExtendedSelection)
 
-        self.pushButton_modelManager.clicked.connect(self.showModelManager)
+        self.pushButton_modelManager.clicked.connect(
+            self.showModelManager, Qt.UniqueConnection
+        )
         self.drawModelList()
         self.drawMaskList()
 
@@ -46,16 +49,17 @@ class UI_DialogModel(Ui_Dialog):
             self.frame_nomodels.hide()
 
         if len(self.filterOperations) > 0:
-            models = {
-                path: model
-                for path, model in models.items()
-                if model["operation"] is not None
-                and len(model["operation"]) > 0
-                and model["operation"][0] in self.filterOperations
-            }
+            # look the paths up in the app's per-operation index instead of copying a filtered catalog
+            paths = [
+                path
+                for operation in self.filterOperations
+                for path in self.app.getModelsByOperation(operation, installed=True)
+            ]
+        else:
+            paths = list(models)
 
         self.listWidget.clear()
-        self.listWidget.addItems(models.keys())
+        self.listWidget.addItems(paths)
         self.listWidget.setCurrentRow(0)
 
         self.device_combobox.clear()
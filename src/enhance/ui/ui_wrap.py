@@ -264,7 +264,7 @@ class Ui_AppWindow(Ui_MainWindow):
                     compareFile = self.app.createOutputFile(baseFile)
                     if compareFile is None:
                         return
-                    self.app.rawFiles.append(compareFile)
+                    self.app.addFile(compareFile)
                     self.signals.appendFile.emit(compareFile)
                     self.signals.selectCompareFile.emit(compareFile)
 
@@ -391,7 +391,7 @@ class Ui_AppWindow(Ui_MainWindow):
         # Create a new OutputFile with the base file's image as starting point
         outputFile = self.app.createOutputFile(baseFile)
         if outputFile is not None:
-            self.app.rawFiles.append(outputFile)
+            self.app.addFile(outputFile)
             self.signals.appendFile.emit(outputFile)
             self.selectionManager.selectCompare(outputFile)
             self.signals.selectCompareFile.emit(outputFile)
@@ -498,6 +498,7 @@ class Ui_AppWindow(Ui_MainWindow):
     def _clearOperationWidgets(self):
         """Clear all operation widgets from the container."""
         for widget in self.operationWidgets:
+            widget.release_controls()
             widget.deleteLater()
         self.operationWidgets.clear()
 
@@ -644,6 +645,8 @@ class Ui_AppWindow(Ui_MainWindow):
                         return
 
                     if isLast:
+                        # Release allocator blocks once the whole chain is done, not between ops
+                        self.app.releaseCachedMemory()
                         self.signals.selectCompareFile.emit(compareFile)
                     self.signals.taskCompleted.emit()
                 return rerunJob